@@ -1,21 +1,151 @@
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from itertools import accumulate
+import re
 from nltk.tokenize import sent_tokenize
 import time
 from textblob import TextBlob
+from textblob.en.sentiments import PatternAnalyzer
+from ingestion import IngestedAudio
 from utils import UNEXPECTED_ERROR
 
-def identify_speaker(diarization, time_position):
+class SpeakerIndex:
+    """Diarization tracks indexed per speaker for O(k log n) lookups over k speakers.
+
+    Each speaker's sorted turn starts and ends, with their prefix sums, give
+    that speaker's total speech before any time in O(log n), so the overlap
+    with a range is the difference of two totals however long the turns are.
+    """
+
+    def __init__(self, tracks=()):
+        self.tracks = sorted((float(start), float(end), speaker) for start, end, speaker in tracks)
+        turns = defaultdict(list)
+        for start, end, speaker in self.tracks:
+            if end > start:
+                turns[speaker].append((start, end))
+
+        self.speakers = {}
+        for speaker, spans in turns.items():
+            starts = [start for start, _ in spans]
+            ends = sorted(end for _, end in spans)
+            # Merged runs answer "who is speaking at t" with one bisect
+            runs = []
+            for start, end in spans:
+                if runs and start <= runs[-1][1]:
+                    runs[-1][1] = max(runs[-1][1], end)
+                else:
+                    runs.append([start, end])
+            self.speakers[speaker] = {
+                "starts": starts, "start_sums": list(accumulate(starts, initial=0.0)),
+                "ends": ends, "end_sums": list(accumulate(ends, initial=0.0)),
+                "run_starts": [start for start, _ in runs], "run_ends": [end for _, end in runs],
+            }
+
+    @classmethod
+    def from_diarization(cls, diarization):
+        if diarization is None:
+            return cls()
+        if isinstance(diarization, cls):
+            return diarization
+        if hasattr(diarization, "itertracks"):
+            return cls((turn.start, turn.end, speaker) for turn, _, speaker in diarization.itertracks(yield_label=True))
+        return cls(diarization)
+
+    @staticmethod
+    def _speech_before(index, t):
+        # Sum over turns of min(t, end) - start for turns starting before t
+        started = bisect_left(index["starts"], t)
+        ended = bisect_left(index["ends"], t)
+        return (started * t - index["start_sums"][started]) - (ended * t - index["end_sums"][ended])
+
+    def lookup(self, start, end=None):
+        """Speaker with the most speech in [start, end), or the speaker active at `start` when no end is given"""
+        end = start if end is None or end < start else end
+        overlap = {}
+        for speaker, index in self.speakers.items():
+            if end > start:
+                seconds = self._speech_before(index, end) - self._speech_before(index, start)
+            else:
+                run = bisect_right(index["run_starts"], start) - 1
+                active = run >= 0 and start < index["run_ends"][run]
+                seconds = index["run_ends"][run] - index["run_starts"][run] if active else 0.0
+            # The prefix sums leave rounding noise where there is no overlap at all
+            if seconds > 1e-9:
+                overlap[speaker] = seconds
+        if not overlap:
+            return "Unknown"
+        return max(overlap, key=overlap.get)
+
+def identify_speaker(diarization, time_position, end_position=None):
     try:
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            if turn.start <= time_position < turn.end:
-                return speaker
-        return "Unknown"
+        # Build a SpeakerIndex once per diarization and pass it in to avoid a rebuild per call
+        return SpeakerIndex.from_diarization(diarization).lookup(time_position, end_position)
     except Exception as e:
         print(UNEXPECTED_ERROR.format(str(e)))
         return "Unknown"
 
+def _claim_words(text):
+    return re.findall(r"\w+", text.lower())
+
+def align_claims(claims, segments):
+    """Attach start/end times to claims by locating their words in the timed transcript segments.
+
+    The best-matching run of words is found inside the best segment and its
+    position is interpolated across the segment's time span. Claims carrying
+    chunk offsets into the joined transcript are only matched against segments
+    in that chunk. Claims that cannot be located keep None times.
+    """
+    segment_words = [_claim_words(segment["text"]) for segment in segments]
+    # Character ranges of the segments within the joined transcript
+    segment_spans = []
+    position = 0
+    for segment in segments:
+        segment_spans.append((position, position + len(segment["text"])))
+        if segment["text"]:
+            position += len(segment["text"]) + 1
+
+    aligned = []
+    for claim in claims:
+        text = claim["text"] if isinstance(claim, dict) else claim
+        words = _claim_words(text)
+        # Claims extracted from a transcript chunk are only searched for inside that chunk
+        chunk = (claim.get("chunk_start"), claim.get("chunk_end")) if isinstance(claim, dict) else (None, None)
+        best = (0, None, 0)
+        if words:
+            vocabulary = set(words)
+            for i, seg_words in enumerate(segment_words):
+                if not seg_words:
+                    continue
+                if chunk[0] is not None and (segment_spans[i][1] <= chunk[0] or segment_spans[i][0] >= chunk[1]):
+                    continue
+                span = min(len(words), len(seg_words))
+                hits = [word in vocabulary for word in seg_words]
+                score = sum(hits[:span])
+                best_score, best_position = score, 0
+                for position in range(1, len(seg_words) - span + 1):
+                    score += hits[position + span - 1] - hits[position - 1]
+                    if score > best_score:
+                        best_score, best_position = score, position
+                if best_score > best[0]:
+                    best = (best_score, i, best_position)
+
+        start = end = None
+        if best[1] is not None:
+            segment = segments[best[1]]
+            n_words = len(segment_words[best[1]])
+            duration = segment["end"] - segment["start"]
+            start = segment["start"] + duration * best[2] / n_words
+            end = segment["start"] + duration * min(n_words, best[2] + len(words)) / n_words
+
+        item = dict(claim) if isinstance(claim, dict) else {"text": text}
+        item["start"], item["end"] = start, end
+        aligned.append(item)
+    return aligned
+
 def process_audio(audio_file, diarization_pipeline):
     try:
-        diarization = diarization_pipeline(audio_file)
+        # Ingested recordings are passed by path, so the pipeline reads the single on-disk copy
+        diarization = diarization_pipeline(audio_file.path if isinstance(audio_file, IngestedAudio) else audio_file)
         # Additional audio processing logic can be added here
         return diarization
     except Exception as e:
@@ -28,4 +158,16 @@ def analyze_sentiment(text):
         return blob.sentiment.polarity
     except Exception as e:
         print(UNEXPECTED_ERROR.format(str(e)))
-        return 0  # Neutral sentiment as fallback
\ No newline at end of file
+        return 0  # Neutral sentiment as fallback
+
+def analyze_sentiments(texts):
+    """Polarity for many texts with one shared analyzer instead of a TextBlob per text"""
+    analyzer = PatternAnalyzer()
+    polarities = []
+    for text in texts:
+        try:
+            polarities.append(analyzer.analyze(text).polarity)
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            polarities.append(0)  # Neutral sentiment as fallback
+    return polarities
@@ -0,0 +1,162 @@
+"""Headless batch analysis of a directory of debate recordings.
+
+Runs the same pipeline as the Streamlit app (transcribe_audio -> extract_claims
+-> process_claims) over every WAV file, with a process pool across files and
+bounded async concurrency within each file. Results are appended to a JSONL
+file and the results store, and finished files are recorded in a checkpoint
+so an interrupted run resumes where it stopped. A recording that transcribes
+to nothing, or whose fact-checks all fail, counts as failed and is retried.
+Both outputs are keyed by path, so a recording re-run after a crash is never
+written twice:
+
+    python batch_cli.py recordings/ --output results.jsonl --workers 4
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from utils import FACT_CHECK_CONCURRENCY, BATCH_FACT_CHECKS
+
+logger = logging.getLogger("fact_checker.batch")
+
+def read_lines(path):
+    """Complete lines of `path`; a partial last line left by a crash is truncated away"""
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    return [line for line in data[:end].decode("utf-8").split("\n") if line.strip()]
+
+def load_checkpoint(path):
+    return set(read_lines(path))
+
+def load_written(path):
+    """Absolute paths of the recordings that already have a row in the JSONL output"""
+    written = set()
+    for line in read_lines(path):
+        try:
+            written.add(os.path.abspath(json.loads(line)["file"]))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return written
+
+def append_line(path, line):
+    # Flushed and synced line by line so a crash never loses a finished file
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+async def _analyze_file(path, concurrency, batch, workers):
+    from groq import AsyncGroq
+    from context_builder import EnhancedContextBuilder
+    from llm_gateway import LLMGateway, BATCH
+    from pipeline import analyze_recording
+    from evidence import EvidenceSearch
+    from utils import GROQ_API_KEY, GROQ_BASE_URL, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE, FETCH_EVIDENCE
+    from web_search import EfficientWebSearch
+
+    # Each worker process has its own gateway with an equal share of the account's rate budget,
+    # and queues its requests at BATCH priority. Gateways do not coordinate across processes, so
+    # lower GROQ_REQUESTS_PER_MINUTE and GROQ_TOKENS_PER_MINUTE when the app shares the account
+    groq_client = LLMGateway(
+        AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, max_retries=0),
+        requests_per_minute=max(1, GROQ_REQUESTS_PER_MINUTE // workers),
+        tokens_per_minute=max(1, GROQ_TOKENS_PER_MINUTE // workers),
+    ).with_priority(BATCH)
+    # Already inside a worker process, so diarization runs on a thread here
+    with ThreadPoolExecutor(max_workers=1) as diarization_executor:
+        async with EfficientWebSearch() as web_searcher:
+            if FETCH_EVIDENCE:
+                web_searcher = EvidenceSearch(web_searcher)
+            return await analyze_recording(
+                path, groq_client, web_searcher, EnhancedContextBuilder(),
+                concurrency=concurrency, batch=batch, diarization_executor=diarization_executor,
+            )
+
+def analyze_file(path, concurrency=FACT_CHECK_CONCURRENCY, batch=BATCH_FACT_CHECKS, workers=1):
+    """Analyze one recording in a worker process and return its JSON-ready record"""
+    from tracing import tracer
+
+    logging.basicConfig(level=logging.INFO)
+    tracer.reset()  # Worker processes are reused, so timings start fresh for each file
+    start = time.perf_counter()
+    analysis = asyncio.run(_analyze_file(path, concurrency, batch, workers))
+    if analysis["error"]:
+        # Raised so the parent neither records nor checkpoints the recording
+        raise RuntimeError(analysis["error"])
+    return {
+        "file": path,
+        "transcribed_text": analysis["transcribed_text"],
+        "transcript_segments": analysis["transcript_segments"],
+        "claims": analysis["timed_claims"],
+        "fact_checks": [
+            {"claim": claim, "speaker": speaker, "result": result}
+            for claim, result, speaker in analysis["fact_checks"]
+        ],
+        "elapsed_seconds": time.perf_counter() - start,
+        "timings": tracer.summary(),
+    }
+
+def run(input_dir, output, checkpoint, workers, concurrency, batch, pattern="*.wav"):
+    files = sorted(glob.glob(os.path.join(input_dir, "**", pattern), recursive=True))
+    done = load_checkpoint(checkpoint)
+    written = load_written(output)
+    pending = [path for path in files if os.path.abspath(path) not in done]
+    logger.info(f"{len(files)} recordings found, {len(files) - len(pending)} already done, {len(pending)} to process")
+
+    from results_store import ResultsStore
+
+    # Only this parent process writes to the store, one transaction per recording
+    results_store = ResultsStore()
+    failures = 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = {executor.submit(analyze_file, path, concurrency, batch, workers): path for path in pending}
+        for completed, future in enumerate(as_completed(futures), 1):
+            path = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # Not checkpointed, so the next run retries it
+                failures += 1
+                logger.error(f"[{completed}/{len(pending)}] {path} failed: {e}")
+                continue
+            source = os.path.abspath(path)
+            # A crash after these writes but before the checkpoint re-runs the file, so neither may duplicate it
+            if source not in written:
+                append_line(output, json.dumps(record, ensure_ascii=False, default=str))
+                written.add(source)
+            fact_checks = [(item["claim"], item["result"], item["speaker"]) for item in record["fact_checks"]]
+            results_store.add_debate(os.path.basename(path), fact_checks, record["claims"], source=source, replace=True)
+            # Last, so a recording is only skipped on resume once both outputs hold it
+            append_line(checkpoint, source)
+            logger.info(f"[{completed}/{len(pending)}] {path}: {len(record['fact_checks'])} claims in {record['elapsed_seconds']:.1f}s")
+    results_store.close()
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description="Fact-check a directory of debate recordings without the UI.")
+    parser.add_argument("input_dir", help="directory searched recursively for recordings")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file results are appended to")
+    parser.add_argument("--checkpoint", help="file listing finished recordings (default: <output>.checkpoint)")
+    parser.add_argument("--pattern", default="*.wav", help="glob for recordings inside input_dir")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="recordings processed in parallel")
+    parser.add_argument("--concurrency", type=int, default=FACT_CHECK_CONCURRENCY, help="concurrent fact-checks per recording")
+    parser.add_argument("--batch", action="store_true", default=BATCH_FACT_CHECKS, help="pack claims into batched Groq requests")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    checkpoint = args.checkpoint or f"{args.output}.checkpoint"
+    failures = run(args.input_dir, args.output, checkpoint, args.workers, args.concurrency, args.batch, args.pattern)
+    raise SystemExit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Per-statement cost of EnhancedContextBuilder as the debate grows.
+
+Each step follows the live pattern: look up the context for a statement, then
+index it. Both are inside the timer, so costs deferred from insert to the next
+query still show up.
+
+Run from the project root:
+
+    python -m benchmarks.context_builder --statements 20000
+"""
+import argparse
+import random
+import time
+from context_builder import EnhancedContextBuilder
+
+def make_statements(count, vocabulary_size=5000, words_per_statement=15, seed=0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(vocabulary_size)]
+    return [" ".join(rng.choices(vocabulary, k=words_per_statement)) for _ in range(count)]
+
+def run(statements, bucket_size, query_every):
+    builder = EnhancedContextBuilder()
+    bucket_times = []
+    query_time = insert_time = 0.0
+    for i, statement in enumerate(statements, 1):
+        start = time.perf_counter()
+        if query_every and i % query_every == 0:
+            builder.get_relevant_context(statement)
+        queried = time.perf_counter()
+        builder.add_statement(statement, f"SPEAKER_{i % 2}")
+        query_time += queried - start
+        insert_time += time.perf_counter() - queried
+        if i % bucket_size == 0:
+            bucket_times.append((i, query_time / bucket_size, insert_time / bucket_size))
+            query_time = insert_time = 0.0
+    return bucket_times
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--statements", type=int, default=20000)
+    parser.add_argument("--bucket-size", type=int, default=1000)
+    parser.add_argument("--query-every", type=int, default=1,
+                        help="look up context before every Nth insert (0 times inserts alone)")
+    args = parser.parse_args()
+
+    statements = make_statements(args.statements)
+    bucket_times = run(statements, args.bucket_size, args.query_every)
+
+    print(f"{'statements':>12} {'us/query':>12} {'us/insert':>12} {'us/step':>12}")
+    for count, query, insert in bucket_times:
+        print(f"{count:>12} {query * 1e6:>12.1f} {insert * 1e6:>12.1f} {(query + insert) * 1e6:>12.1f}")
+    first, last = bucket_times[0][2], bucket_times[-1][2]
+    print(f"last/first bucket insert ratio: {last / first:.2f} (flat cost stays close to 1; "
+          f"a query scores every stored statement, so it grows with the debate)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Local stand-ins for DuckDuckGo and the Groq chat completions API.
+
+Search requests replay the saved pages in benchmarks/fixtures, and fact-check
+requests replay the recorded verdicts in fixtures/fact_checks.json (streamed
+or batched, matching the request). Latency, error rate and a requests-per-minute
+limit are configurable, so retries and rate limiting get exercised too.
+Point the app at them with:
+
+    python -m benchmarks.fake_services --port 8799 --latency 0.2 --error-rate 0.02 --rpm 600
+    SEARCH_URL=http://127.0.0.1:8799/html/ GROQ_BASE_URL=http://127.0.0.1:8799 streamlit run main.py
+"""
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import os
+import random
+import re
+import time
+from collections import deque
+from aiohttp import web
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures")
+
+class FakeServices:
+    def __init__(self, latency=0.05, jitter=0.5, error_rate=0.0, requests_per_minute=None, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self.random = random.Random(seed)
+        self.recent = {"search": deque(), "chat": deque()}
+        self.counters = {"search": 0, "chat": 0, "errors": 0, "rate_limited": 0}
+        self.runner = None
+
+        pages = []
+        for path in sorted(glob.glob(os.path.join(FIXTURES, "duckduckgo_*.html"))):
+            with open(path, encoding="utf-8") as f:
+                pages.append(f.read())
+        self.pages = itertools.cycle(pages)
+        with open(os.path.join(FIXTURES, "fact_checks.json"), encoding="utf-8") as f:
+            self.verdicts = itertools.cycle(json.load(f))
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/html/", self.search)
+        app.router.add_post("/html/", self.search)
+        app.router.add_post("/openai/v1/chat/completions", self.chat)
+        return app
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Serve in the running event loop; returns the base URL"""
+        self.runner = web.AppRunner(self.app(), access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+
+    async def _admit(self, service):
+        """Simulate latency, then fail the request if it is over the rate limit or unlucky"""
+        await asyncio.sleep(self.latency * (1 + self.jitter * (2 * self.random.random() - 1)))
+        self.counters[service] += 1
+        if self.requests_per_minute:
+            now = time.monotonic()
+            recent = self.recent[service]
+            while recent and now - recent[0] > 60:
+                recent.popleft()
+            if len(recent) >= self.requests_per_minute:
+                self.counters["rate_limited"] += 1
+                retry_after = max(0.0, 60 - (now - recent[0]))
+                return web.json_response({"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                                         status=429, headers={"retry-after": f"{retry_after:.2f}"})
+            recent.append(now)
+        if self.random.random() < self.error_rate:
+            self.counters["errors"] += 1
+            return web.json_response({"error": {"message": "Injected failure", "type": "internal_error"}}, status=503)
+        return None
+
+    def _rate_headers(self, service):
+        if not self.requests_per_minute:
+            return {}
+        return {"x-ratelimit-remaining-requests": str(max(0, self.requests_per_minute - len(self.recent[service])))}
+
+    async def search(self, request):
+        failure = await self._admit("search")
+        if failure is not None:
+            return failure
+        return web.Response(text=next(self.pages), content_type="text/html")
+
+    def _reply(self, prompt):
+        # Batched fact-checks ask for an array with one verdict per "### Claim n"
+        if "Respond with a single JSON array" in prompt:
+            claims = len(re.findall(r"### Claim \d+", prompt))
+            verdicts = [{"Claim": n, **next(self.verdicts)} for n in range(1, claims + 1)]
+            return "```json\n" + json.dumps(verdicts, indent=2) + "\n```"
+        if "extract all clear and concise claims" in prompt:
+            text = prompt.split("Transcribed text:", 1)[-1]
+            sentences = [sentence.strip() for sentence in re.split(r"(?<=[.!?])\s+", text) if len(sentence.split()) > 3]
+            return "\n".join(f"{n}. {sentence}" for n, sentence in enumerate(sentences, 1))
+        return "```json\n" + json.dumps(next(self.verdicts), indent=2) + "\n```"
+
+    async def chat(self, request):
+        failure = await self._admit("chat")
+        if failure is not None:
+            return failure
+        body = await request.json()
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", []))
+        content = self._reply(prompt)
+        prompt_tokens = len(prompt) // 4 + 1
+        completion_tokens = len(content) // 4 + 1
+        created = int(time.time())
+        headers = self._rate_headers("chat")
+
+        if not body.get("stream"):
+            return web.json_response({
+                "id": f"chatcmpl-{self.counters['chat']}",
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+            }, headers=headers)
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream", **headers})
+        await response.prepare(request)
+        for start in range(0, len(content), 16):
+            chunk = {
+                "id": f"chatcmpl-{self.counters['chat']}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": body.get("model"),
+                "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+async def _serve(args):
+    services = FakeServices(args.latency, args.jitter, args.error_rate, args.rpm, args.seed)
+    url = await services.start(args.host, args.port)
+    print(f"Fake search at {url}/html/ and chat completions at {url}/openai/v1/chat/completions")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await services.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--latency", type=float, default=0.05, help="mean seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.5, help="latency varies by +/- this fraction")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 503")
+    parser.add_argument("--rpm", type=int, help="requests per minute per service before answering 429")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""End-to-end throughput of process_claims against local fake services.
+
+Starts the stand-ins from benchmarks.fake_services, points EfficientWebSearch
+and the Groq client at them, and fact-checks synthetic claims at each scale.
+Reports throughput, p50/p95 latency per stage and peak memory. Run from the
+project root (spaCy must be installed for claim enrichment):
+
+    python -m benchmarks.pipeline --claims 10 100 1000 10000 --latency 0.05 --concurrency 20
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import defaultdict
+from benchmarks.fake_services import FakeServices
+
+WORDS = ("unemployment inflation wages tariffs taxes deficit budget crime housing energy emissions "
+         "schools hospitals immigration exports manufacturing jobs prices rent growth").split()
+
+def make_claims(count, duplicate_rate=0.1, seed=0):
+    rng = random.Random(seed)
+    claims = []
+    for i in range(count):
+        if claims and rng.random() < duplicate_rate:
+            claims.append(rng.choice(claims))  # Repeated talking points exercise dedup
+            continue
+        subject, verb_object = rng.sample(WORDS, 2)
+        claims.append(f"{subject.capitalize()} rose by {rng.randint(1, 99)} percent since {rng.randint(1990, 2024)} while {verb_object} fell in region {i}.")
+    return claims
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+class StageTimes:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def record(self, stage, seconds):
+        self.samples[stage].append(seconds)
+
+class TimedSearch:
+    """Records the latency of every EfficientWebSearch.search call"""
+
+    def __init__(self, searcher, times):
+        self.searcher = searcher
+        self.times = times
+
+    async def search(self, query, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await self.searcher.search(query, *args, **kwargs)
+        finally:
+            self.times.record("search", time.perf_counter() - start)
+
+class _TimedStream:
+    def __init__(self, stream, times, start):
+        self.stream = stream
+        self.times = times
+        self.start = start
+
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                yield chunk
+        finally:
+            self.times.record("llm", time.perf_counter() - self.start)
+
+class TimedLLM:
+    """Records Groq request latency, through to the end of the stream for streamed responses"""
+
+    def __init__(self, client, times):
+        self.client = client
+        self.times = times
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**kwargs)
+        if kwargs.get("stream"):
+            return _TimedStream(response, self.times, start)
+        self.times.record("llm", time.perf_counter() - start)
+        return response
+
+def timed_context_builder(times):
+    from context_builder import EnhancedContextBuilder
+
+    class TimedContextBuilder(EnhancedContextBuilder):
+        def add_statement(self, statement, speaker):
+            start = time.perf_counter()
+            super().add_statement(statement, speaker)
+            times.record("context_insert", time.perf_counter() - start)
+
+        def get_relevant_contexts(self, statements, *args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return super().get_relevant_contexts(statements, *args, **kwargs)
+            finally:
+                times.record("context_query", time.perf_counter() - start)
+
+    return TimedContextBuilder()
+
+async def run_scale(count, args, seed):
+    from groq import AsyncGroq
+    from llm_gateway import LLMGateway
+    from pipeline import process_claims
+    from web_search import EfficientWebSearch
+
+    times = StageTimes()
+    claims = make_claims(count, seed=seed)
+    gateway = LLMGateway(AsyncGroq(api_key="benchmark", base_url=os.environ["GROQ_BASE_URL"], max_retries=0),
+                         requests_per_minute=args.llm_rpm, tokens_per_minute=args.llm_tpm, base_delay=0.05, max_delay=2.0)
+    if args.trace_memory:
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    async with EfficientWebSearch(rate_limit=args.search_rate) as searcher:
+        fact_checks = await process_claims(
+            claims, "", None, TimedLLM(gateway, times), TimedSearch(searcher, times), timed_context_builder(times),
+            concurrency=args.concurrency, batch=args.batch,
+        )
+    elapsed = time.perf_counter() - start
+
+    errors = sum(1 for _, result, _ in fact_checks if result.get("Verification") == "ERROR")
+    gateway_metrics = gateway.metrics()
+    print(f"\n{count} claims: {elapsed:.2f} s, {count / elapsed:.1f} claims/s, "
+          f"{len(fact_checks) - errors}/{count} verdicts, {gateway_metrics['retries']} LLM retries")
+    for stage in ("search", "llm", "context_insert", "context_query"):
+        samples = times.samples.get(stage, [])
+        print(f"  {stage:<15} n={len(samples):<6} p50 {percentile(samples, 0.5) * 1000:9.2f} ms  p95 {percentile(samples, 0.95) * 1000:9.2f} ms")
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    memory = f"  peak RSS {peak_rss:.0f} MiB"
+    if args.trace_memory:
+        memory += f", peak Python allocations this run {tracemalloc.get_traced_memory()[1] / 2 ** 20:.1f} MiB"
+    print(memory)
+
+async def run(args):
+    services = FakeServices(args.latency, args.jitter, args.error_rate, args.rpm, args.seed)
+    url = await services.start()
+    # Set before the pipeline modules are imported, since they read configuration at import time
+    os.environ["SEARCH_URL"] = f"{url}/html/"
+    os.environ["GROQ_BASE_URL"] = url
+    os.environ["CACHE_DIR"] = tempfile.mkdtemp(prefix="fact_checker_bench_")
+    os.environ.setdefault("FETCH_EVIDENCE", "false")
+    try:
+        from model_registry import models
+        models.get("spacy")  # Load once up front so the first scale doesn't pay for it
+        if args.trace_memory:
+            tracemalloc.start()
+        for n, count in enumerate(args.claims):
+            # Fresh claims at every scale so the fact-check and search caches start cold
+            await run_scale(count, args, seed=args.seed + n)
+        print(f"\nFake services: {services.counters}")
+    finally:
+        await services.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--claims", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--concurrency", type=int, default=20, help="concurrent fact-checks")
+    parser.add_argument("--batch", action="store_true", help="use batched fact-check requests")
+    parser.add_argument("--latency", type=float, default=0.05, help="fake service latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake requests that fail with 503")
+    parser.add_argument("--rpm", type=int, help="fake services' requests-per-minute limit (answers 429 beyond it)")
+    parser.add_argument("--llm-rpm", type=int, default=1_000_000, help="LLM gateway request budget")
+    parser.add_argument("--llm-tpm", type=int, default=100_000_000, help="LLM gateway token budget")
+    parser.add_argument("--search-rate", type=float, default=1000, help="search requests per second")
+    parser.add_argument("--trace-memory", action="store_true", help="also report peak Python allocations (slower)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
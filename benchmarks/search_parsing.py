@@ -0,0 +1,56 @@
+"""Search result parsing cost per claim on saved DuckDuckGo pages.
+
+Compares the original full-page BeautifulSoup parse with every installed
+parser backend (bounded to the results actually used). Run from the project root:
+
+    python -m benchmarks.search_parsing --results 3 --repeat 200
+"""
+import argparse
+import glob
+import os
+import time
+from bs4 import BeautifulSoup
+from web_search import PARSERS, available_parsers, truncate_results
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "duckduckgo_*.html")
+
+def parse_full_page(html, num_results):
+    # What search() did before: build the whole tree, then keep the first N blocks
+    soup = BeautifulSoup(html, 'html.parser')
+    results = []
+    for result in soup.find_all('div', class_='result__body')[:num_results]:
+        title_elem = result.find('h2', class_='result__title')
+        snippet_elem = result.find('a', class_='result__snippet')
+        link_elem = result.find('a', class_='result__url')
+        if title_elem and snippet_elem and link_elem:
+            results.append({'title': title_elem.text.strip(), 'snippet': snippet_elem.text.strip(), 'link': link_elem.get('href', '')})
+    return results
+
+def time_parser(parse, pages, num_results, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            parse(html, num_results)
+    return (time.perf_counter() - start) / (repeat * len(pages))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--results", type=int, default=3, help="results kept per query")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(FIXTURES)):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    print(f"{len(pages)} fixture pages, {sum(map(len, pages)) // len(pages) // 1024} KiB on average")
+
+    baseline = time_parser(parse_full_page, pages, args.results, args.repeat)
+    print(f"{'full page (bs4)':<20} {baseline * 1000:8.3f} ms/claim")
+    for name in available_parsers():
+        bounded = PARSERS[name]
+        elapsed = time_parser(lambda html, n: bounded(truncate_results(html, n), n), pages, args.results, args.repeat)
+        print(f"{name:<20} {elapsed * 1000:8.3f} ms/claim  ({baseline / elapsed:.1f}x)")
+
+if __name__ == "__main__":
+    main()
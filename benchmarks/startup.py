@@ -0,0 +1,37 @@
+"""Startup cost with lazily loaded, shared models.
+
+Run from the project root:
+
+    python -m benchmarks.startup --models spacy diarization
+"""
+import argparse
+import time
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="*", default=["spacy"],
+                        help="models to load (diarization needs HUGGINGFACE_TOKEN)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    from model_registry import models
+    print(f"import model_registry: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    start = time.perf_counter()
+    models.warm_up(args.models)
+    print(f"warm_up() returned after: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for name in args.models:
+        start = time.perf_counter()
+        models.get(name)
+        waited = time.perf_counter() - start
+        print(f"{name}: load {models.load_times[name]:.2f} s, first get waited {waited:.2f} s")
+
+    # A rerun only pays for the dictionary lookup
+    for name in args.models:
+        start = time.perf_counter()
+        models.get(name)
+        print(f"{name}: warm get {(time.perf_counter() - start) * 1e6:.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,202 @@
-from collections import defaultdict
+import numpy as np
+from scipy import sparse
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.preprocessing import normalize
 from utils import UNEXPECTED_ERROR
 
+def _grow(array, size):
+    """`array`, or a copy at least twice as long when it is shorter than `size`"""
+    if size <= len(array):
+        return array
+    grown = np.zeros(max(size, 2 * len(array)), dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
 class EnhancedContextBuilder:
     def __init__(self, max_context_size=5, topic_threshold=0.8):
         self.statements = []
         self.speakers = []
         self.max_context_size = max_context_size
         self.topic_threshold = topic_threshold
-        self.tfidf_vectorizer = TfidfVectorizer()
-        self.tfidf_matrix = None
+        # Same tokenisation as TfidfVectorizer, but the vocabulary and document
+        # frequencies are maintained incrementally instead of refit on every insert
+        self.analyzer = TfidfVectorizer().build_analyzer()
+        self.vocabulary = {}
+        self.feature_names = []
+        self.document_frequencies = np.zeros(1024, dtype=np.int64)
+        # Raw term counts, one row per statement, appended in place to arrays that
+        # grow by doubling; idf is applied at query time, so inserts never rebuild them
+        self._indptr = np.zeros(1024, dtype=np.int64)
+        self._indices = np.zeros(16384, dtype=np.int32)
+        self._counts = np.zeros(16384, dtype=np.float64)
+        self._nnz = 0
+        self._tfidf_matrix = None
 
     def add_statement(self, statement, speaker):
         try:
+            counts = {}
+            for term in self.analyzer(statement):
+                index = self.vocabulary.get(term)
+                if index is None:
+                    index = len(self.feature_names)
+                    self.vocabulary[term] = index
+                    self.feature_names.append(term)
+                counts[index] = counts.get(index, 0) + 1
+
+            self.document_frequencies = _grow(self.document_frequencies, len(self.feature_names))
+            for index in counts:
+                self.document_frequencies[index] += 1
+
+            nnz = self._nnz + len(counts)
+            self._indices = _grow(self._indices, nnz)
+            self._counts = _grow(self._counts, nnz)
+            self._indptr = _grow(self._indptr, len(self.statements) + 2)
+            terms = sorted(counts)
+            self._indices[self._nnz:nnz] = terms
+            self._counts[self._nnz:nnz] = [counts[index] for index in terms]
+            self._indptr[len(self.statements) + 1] = nnz
+            self._nnz = nnz
             self.statements.append(statement)
             self.speakers.append(speaker)
-            self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.statements)
+            self._tfidf_matrix = None
         except Exception as e:
             print(UNEXPECTED_ERROR.format(str(e)))
 
-    def get_relevant_context(self, statement):
+    @property
+    def idf(self):
+        # Smoothed idf, identical to TfidfVectorizer(smooth_idf=True)
+        n_documents = len(self.statements)
+        document_frequencies = self.document_frequencies[:len(self.feature_names)]
+        return np.log((1 + n_documents) / (1 + document_frequencies)) + 1
+
+    def count_matrix(self, data=None):
+        """Raw term counts of the indexed statements, as a CSR view over the stored arrays (no copy)"""
+        n = len(self.statements)
+        matrix = sparse.csr_matrix(
+            (self._counts[:self._nnz] if data is None else data, self._indices[:self._nnz], self._indptr[:n + 1]),
+            shape=(n, len(self.feature_names)), copy=False,
+        )
+        # Rows are stored with sorted, unique term indices; saves scipy re-checking them on every query
+        matrix.has_sorted_indices = True
+        matrix.has_canonical_format = True
+        return matrix
+
+    @property
+    def tfidf_matrix(self):
+        # Only get_current_topics needs the full weighted matrix; it is cached until the next insert
+        if self._tfidf_matrix is None and self.statements:
+            self._tfidf_matrix = normalize(self.count_matrix().multiply(self.idf).tocsr())
+        return self._tfidf_matrix
+
+    def _count_rows(self, statements):
+        """Term counts of statements against the current vocabulary, ignoring unseen terms"""
+        indptr = [0]
+        indices = []
+        counts = []
+        for statement in statements:
+            row = {}
+            for term in self.analyzer(statement):
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    row[index] = row.get(index, 0) + 1
+            indices.extend(row.keys())
+            counts.extend(row.values())
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float64), np.asarray(indices, dtype=np.int64), np.asarray(indptr)),
+            shape=(len(statements), len(self.feature_names)),
+        )
+
+    def transform(self, statements):
+        """Vectorize statements against the current vocabulary, ignoring unseen terms"""
+        return normalize(self._count_rows(statements).multiply(self.idf).tocsr())
+
+    def similarities(self, statements):
+        """Cosine similarities (TF-IDF, as TfidfVectorizer weights them) of `statements` to every indexed statement.
+
+        The idf weights go on the query side instead of the stored rows:
+        (q * idf) . (d * idf) = (q * idf^2) . d, and each row's norm |d * idf| is
+        one sparse product over the stored counts. Nothing is rebuilt per insert.
+        """
+        idf = self.idf
+        norms = np.sqrt(self.count_matrix(np.square(self._counts[:self._nnz])) @ np.square(idf))
+        norms[norms == 0] = 1.0
+
+        queries = self._count_rows(statements)
+        rows = np.repeat(np.arange(len(statements)), np.diff(queries.indptr))
+        queries.data *= idf[queries.indices]
+        query_norms = np.sqrt(np.bincount(rows, weights=np.square(queries.data), minlength=len(statements)))
+        queries.data *= idf[queries.indices] / query_norms[rows]
+
+        similarities = (self.count_matrix() @ queries.T).T.tocsr()
+        similarities.data /= norms[similarities.indices]
+        return similarities
+
+    def get_relevant_context(self, statement, k=None, window=None, speaker=None):
         try:
             if not self.statements:
                 return ""
 
-            statement_vector = self.tfidf_vectorizer.transform([statement])
-            similarities = cosine_similarity(statement_vector, self.tfidf_matrix).flatten()
+            speakers = None if speaker is None else [speaker]
+            return self.get_relevant_contexts([statement], k=k, window=window, speakers=speakers)[0]
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            return ""
+
+    def get_relevant_contexts(self, statements, k=None, window=None, speakers=None, limits=None):
+        """Score many statements in one sparse product and return a context string for each.
 
-            top_indices = similarities.argsort()[:-2:-1]
+        k defaults to max_context_size. window keeps only the most recent indexed
+        statements, speakers restricts each match to the given speaker, and limits
+        caps how many leading indexed statements each query may see.
+        """
+        try:
+            if not self.statements or not statements:
+                return ["" for _ in statements]
+
+            k = self.max_context_size if k is None else k
+            # Rows are L2-normalised, so the product holds cosine similarities; only
+            # non-zero entries can clear a non-negative threshold
+            similarities = self.similarities(statements)
+
+            contexts = []
+            for row in range(len(statements)):
+                start, end = similarities.indptr[row], similarities.indptr[row + 1]
+                candidates = similarities.indices[start:end]
+                scores = similarities.data[start:end]
 
-            context = []
-            for i in top_indices:
-                if similarities[i] > self.topic_threshold:
-                    context.append(self.statements[i])
+                keep = scores > self.topic_threshold
+                limit = len(self.statements) if limits is None else limits[row]
+                keep &= candidates < limit
+                if window is not None:
+                    keep &= candidates >= limit - window
+                if speakers is not None and speakers[row] is not None:
+                    keep &= np.fromiter((self.speakers[i] == speakers[row] for i in candidates), dtype=bool, count=len(candidates))
+                candidates, scores = candidates[keep], scores[keep]
 
-            return " ".join(context[-self.max_context_size:])
+                if len(candidates) > k:
+                    top = np.argpartition(-scores, k - 1)[:k]
+                    candidates = candidates[top]
+
+                # Keep the selected statements in the order they were said
+                contexts.append(" ".join(self.statements[i] for i in np.sort(candidates)))
+            return contexts
         except Exception as e:
             print(UNEXPECTED_ERROR.format(str(e)))
-            return ""
+            return ["" for _ in statements]
 
     def get_current_topics(self, top_n=3):
         try:
             if not self.statements:
                 return []
 
-            feature_names = self.tfidf_vectorizer.get_feature_names_out()
             tfidf_scores = self.tfidf_matrix.sum(axis=0).A1
 
-            keywords_with_scores = list(zip(feature_names, tfidf_scores))
-            keywords_with_scores.sort(key=lambda item: item[1], reverse=True)
+            # Ties fall back to alphabetical order, as with get_feature_names_out()
+            keywords_with_scores = list(zip(self.feature_names, tfidf_scores))
+            keywords_with_scores.sort(key=lambda item: (-item[1], item[0]))
 
             return [keyword for keyword, score in keywords_with_scores[:top_n]]
         except Exception as e:
             print(UNEXPECTED_ERROR.format(str(e)))
-            return []
\ No newline at end of file
+            return []
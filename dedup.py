@@ -0,0 +1,57 @@
+import re
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from utils import DEDUP_THRESHOLD, UNEXPECTED_ERROR
+
+# Unlike the context index, single characters ("3 percent", "a B grade") are kept and
+# stopwords dropped, so similarity reflects the facts a claim states rather than its phrasing
+TOKEN_PATTERN = r"(?u)\b\w+\b"
+NUMBER = re.compile(r"\d+(?:[.,]\d+)*")
+BLOCK_ROWS = 512  # Rows of the similarity matrix computed at a time
+
+def cluster_claims(claims, threshold=DEDUP_THRESHOLD):
+    """Group near-identical claims by TF-IDF cosine similarity.
+
+    Each claim joins the earlier representative it is most similar to, if that
+    similarity reaches `threshold` and both claims state the same numbers;
+    otherwise it becomes a representative itself. Members are only ever compared
+    with their representative, so dissimilar claims are never chained together.
+    Returns, for every claim, the index of its cluster's representative.
+    CPU-bound: run it off the event loop for long claim lists.
+    """
+    representatives = list(range(len(claims)))
+    if len(claims) < 2:
+        return representatives
+    try:
+        try:
+            matrix = TfidfVectorizer(token_pattern=TOKEN_PATTERN, stop_words="english").fit_transform(claims)
+        except ValueError:
+            return representatives  # Nothing but stopwords
+        numbers = [frozenset(NUMBER.findall(claim)) for claim in claims]
+
+        for first in range(0, len(claims), BLOCK_ROWS):
+            # Similarities to earlier claims only, thresholded before any Python-level work
+            block = (matrix[first:first + BLOCK_ROWS] @ matrix[:first + BLOCK_ROWS].T).tocsr()
+            for row in range(block.shape[0]):
+                i = first + row
+                start, end = block.indptr[row], block.indptr[row + 1]
+                columns, similarities = block.indices[start:end], block.data[start:end]
+                keep = (columns < i) & (similarities >= threshold)
+                for j in columns[keep][np.argsort(-similarities[keep], kind="stable")]:
+                    if representatives[j] == j and numbers[j] == numbers[i]:
+                        representatives[i] = int(j)
+                        break
+        return representatives
+    except Exception as e:
+        print(UNEXPECTED_ERROR.format(str(e)))
+        return list(range(len(claims)))
+
+def fan_out(claims, representatives, representative_results):
+    """Copy each representative's verdict to every member of its cluster"""
+    results = []
+    for i, representative in enumerate(representatives):
+        result = dict(representative_results[representative])
+        if representative != i:
+            result["Duplicate Of"] = claims[representative]
+        results.append(result)
+    return results
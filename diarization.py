@@ -0,0 +1,123 @@
+import asyncio
+import multiprocessing
+import os
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from disk_cache import DiskCache, make_cache_key
+from ingestion import load_audio
+from tracing import tracer
+from utils import CACHE_DIR, DIARIZATION_MODEL, DIARIZATION_WINDOW, DIARIZATION_OVERLAP, DIARIZATION_WORKERS, UNEXPECTED_ERROR
+
+# Tracks are stored as [start, end, speaker] lists keyed by the audio's content hash
+diarization_cache = DiskCache(os.path.join(CACHE_DIR, "diarization.sqlite"))
+
+_executor = None
+
+def get_executor():
+    # spawn keeps torch's thread pools out of forked children
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=DIARIZATION_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _overlap(a_start, a_end, b_start, b_end):
+    return max(0.0, min(a_end, b_end) - max(a_start, b_start))
+
+def stitch_windows(windows):
+    """Merge per-window diarizations into one track list with consistent speaker labels.
+
+    `windows` holds (window_start, window_end, tracks) in time order, with track
+    times already absolute. Each window's local labels are matched to the global
+    labels that speak most in the region shared with the previous window; labels
+    with no match become new speakers. Overlapping regions are split at their midpoint.
+    """
+    stitched = []
+    speaker_count = 0
+    previous_end = None
+    for window_start, window_end, tracks in windows:
+        mapping = {}
+        if previous_end is not None and previous_end > window_start:
+            overlap_scores = defaultdict(float)
+            recent = [track for track in stitched if track[1] > window_start]
+            for start, end, local in tracks:
+                for g_start, g_end, speaker in recent:
+                    overlap_scores[(local, speaker)] += _overlap(start, end, max(g_start, window_start), min(g_end, previous_end))
+            used = set()
+            for (local, speaker), seconds in sorted(overlap_scores.items(), key=lambda item: -item[1]):
+                if seconds > 0 and local not in mapping and speaker not in used:
+                    mapping[local] = speaker
+                    used.add(speaker)
+
+            # Keep the previous window up to the midpoint of the overlap and this one after it
+            cut = (window_start + previous_end) / 2
+            stitched = [(start, min(end, cut), speaker) for start, end, speaker in stitched if start < cut]
+            tracks = [(max(start, cut), end, local) for start, end, local in tracks if end > cut]
+
+        for start, end, local in tracks:
+            if local not in mapping:
+                mapping[local] = f"SPEAKER_{speaker_count:02d}"
+                speaker_count += 1
+            stitched.append((start, end, mapping[local]))
+        previous_end = window_end
+    return stitched
+
+def diarize_audio(audio, window=DIARIZATION_WINDOW, overlap=DIARIZATION_OVERLAP):
+    """Run the diarization pipeline over an IngestedAudio's speech in overlapping windows (runs in a worker process).
+
+    Windows are cut from the speech regions laid end to end, so silence and
+    applause are never diarized, and only one window at a time is converted
+    to a float tensor.
+    """
+    import torch
+    from model_registry import models
+
+    sample_rate = audio.sample_rate
+    speech = audio.speech_map()
+    if speech.length == 0:
+        return []
+    pipeline = models.get("diarization")
+
+    window_size = int(window * sample_rate)
+    step = max(1, window_size - int(overlap * sample_rate))
+    windows = []
+    for start in range(0, speech.length, step):
+        end = min(speech.length, start + window_size)
+        chunk = speech.gather(audio.samples, start, end)
+        waveform = torch.from_numpy(chunk.astype("float32") / 32768.0).unsqueeze(0)
+        annotation = pipeline({"waveform": waveform, "sample_rate": sample_rate})
+        offset = start / sample_rate
+        tracks = [(offset + turn.start, offset + turn.end, label) for turn, _, label in annotation.itertracks(yield_label=True)]
+        windows.append((offset, end / sample_rate, tracks))
+        if end >= speech.length:
+            break
+
+    # Back from the speech timeline to recording time; tracks spanning skipped audio are split there
+    return [
+        (low / sample_rate, high / sample_rate, speaker)
+        for start, end, speaker in stitch_windows(windows)
+        for low, high in speech.to_original(round(start * sample_rate), round(end * sample_rate))
+    ]
+
+async def diarize(audio_file, window=DIARIZATION_WINDOW, overlap=DIARIZATION_OVERLAP, executor=None):
+    """Diarize off the event loop; results are cached by the audio's content hash and speech regions.
+
+    Returns a list of (start, end, speaker) tracks, or None when diarization fails.
+    """
+    try:
+        audio = await load_audio(audio_file)
+        key = make_cache_key("diarization", DIARIZATION_MODEL, audio.digest, window, overlap, audio.regions)
+        with tracer.span("diarization", cache_hit=False) as span:
+            cached = diarization_cache.get(key)
+            if cached is not None:
+                span["cache_hit"] = True
+                return [tuple(track) for track in cached]
+
+            # The worker reopens the memory map from the file; no samples are pickled
+            loop = asyncio.get_running_loop()
+            tracks = await loop.run_in_executor(executor or get_executor(), diarize_audio, audio, window, overlap)
+            span["tracks"] = len(tracks)
+            diarization_cache.set(key, [list(track) for track in tracks])
+            return tracks
+    except Exception as e:
+        print(UNEXPECTED_ERROR.format(str(e)))
+        return None
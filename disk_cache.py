@@ -0,0 +1,123 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils import UNEXPECTED_ERROR
+
+EVICT_EVERY = 256  # Writes between sweeps for expired entries
+EVICT_TO = 0.9  # Size eviction trims to this fraction of max_entries, so it runs once per many writes
+
+def normalize_text(text):
+    """Collapse case and whitespace so trivially different strings share a cache key"""
+    return " ".join(str(text).lower().split())
+
+def make_cache_key(*parts):
+    """Content-addressed key: a SHA-256 over the JSON encoding of the parts"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DiskCache:
+    """A small SQLite-backed key/value cache with TTL and size-based (LRU) eviction.
+
+    Eviction is amortized: writes keep an upper-bound estimate of the entry
+    count, and expired or least recently used rows are deleted in batches every
+    EVICT_EVERY writes, or as soon as the estimate passes max_entries.
+    """
+
+    def __init__(self, path, ttl=None, max_entries=10000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS cache_created ON cache (created)")
+        self.writes = 0
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key, default=None):
+        try:
+            with self.lock:
+                row = self.connection.execute("SELECT value, created FROM cache WHERE key = ?", (key,)).fetchone()
+                now = time.time()
+                if row is None or (self.ttl is not None and now - row[1] > self.ttl):
+                    if row is not None:
+                        self.connection.execute("DELETE FROM cache WHERE key = ?", (key,))
+                    self.misses += 1
+                    return default
+                self.connection.execute("UPDATE cache SET accessed = ? WHERE key = ?", (now, key))
+                self.hits += 1
+                return json.loads(row[0])
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        try:
+            with self.lock:
+                now = time.time()
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO cache (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(value), now, now),
+                )
+                # Replacing a key also counts, so the estimate never falls below the real size
+                self.entries += 1
+                self.writes += 1
+                if self.writes >= EVICT_EVERY or (self.max_entries is not None and self.entries > self.max_entries):
+                    self._evict(now)
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+
+    def _evict(self, now):
+        self.writes = 0
+        if self.ttl is not None:
+            self.connection.execute("DELETE FROM cache WHERE created < ?", (now - self.ttl,))
+        count = self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        if self.max_entries is not None and count > self.max_entries:
+            keep = int(self.max_entries * EVICT_TO)
+            self.connection.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed ASC LIMIT ?)",
+                (count - keep,),
+            )
+            count = keep
+        self.entries = count
+
+    def __contains__(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT created FROM cache WHERE key = ?", (key,)).fetchone()
+        return row is not None and (self.ttl is None or time.time() - row[0] <= self.ttl)
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def clear(self):
+        with self.lock:
+            self.connection.execute("DELETE FROM cache")
+            self.entries = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,38 @@
+import asyncio
+from audio_processing import analyze_sentiments
+from model_registry import models
+from tracing import tracer
+from utils import UNEXPECTED_ERROR
+
+# Only named entities are used as claim categories
+NER_COMPONENTS = ("tok2vec", "ner")
+
+def categorize_claims(claims, batch_size=64):
+    """Entity labels for every claim in one nlp.pipe pass with everything but NER disabled"""
+    nlp = models.get("spacy")
+    disable = [name for name in nlp.pipe_names if name not in NER_COMPONENTS]
+    return [
+        sorted({ent.label_ for ent in doc.ents})
+        for doc in nlp.pipe(claims, batch_size=batch_size, disable=disable)
+    ]
+
+def enrich(claims, batch_size=64, categories=None):
+    """Categories and sentiment per claim; pass `categories` when NER already ran (as in triage)"""
+    if categories is None:
+        try:
+            categories = categorize_claims(claims, batch_size)
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            categories = [[] for _ in claims]
+    return [
+        {"categories": claim_categories, "sentiment": sentiment}
+        for claim_categories, sentiment in zip(categories, analyze_sentiments(claims))
+    ]
+
+async def enrich_claims(claims, batch_size=64, executor=None, categories=None):
+    """Categories and sentiment for the whole claim list, computed off the event loop"""
+    if not claims:
+        return []
+    loop = asyncio.get_running_loop()
+    with tracer.span("enrichment", claims=len(claims)):
+        return await loop.run_in_executor(executor, enrich, list(claims), batch_size, categories)
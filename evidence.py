@@ -0,0 +1,160 @@
+"""Evidence retrieval for fact-checks.
+
+Search snippets are often too thin to verify a claim. EvidenceSearch wraps an
+EfficientWebSearch: for each query it fetches the pages behind the top results
+(concurrently, with size caps and timeouts), extracts their main text, splits
+it into passages and keeps only the passages that score highest against the
+claim. They are attached to their search result as "passages", so the prompt
+grows by a bounded number of words per claim.
+"""
+import asyncio
+import logging
+import os
+import aiohttp
+import numpy as np
+from bs4 import BeautifulSoup
+from context_builder import EnhancedContextBuilder
+from disk_cache import DiskCache
+from tracing import tracer
+from utils import (CACHE_DIR, SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, EVIDENCE_PAGES, EVIDENCE_MAX_BYTES,
+                   EVIDENCE_TIMEOUT, EVIDENCE_PASSAGES, EVIDENCE_PASSAGE_WORDS, UNEXPECTED_ERROR)
+
+logger = logging.getLogger(__name__)
+
+NON_CONTENT_TAGS = ['script', 'style', 'noscript', 'template', 'svg', 'iframe', 'nav', 'header', 'footer', 'aside', 'form']
+BLOCK_TAGS = ['p', 'li', 'h1', 'h2', 'h3', 'blockquote', 'td']
+
+def extract_text(html):
+    """Main text of a page: its paragraph-like blocks, without navigation, scripts or boilerplate"""
+    soup = BeautifulSoup(html, 'html.parser')
+    for tag in soup(NON_CONTENT_TAGS):
+        tag.decompose()
+    root = soup.find('article') or soup.find('main') or soup.body or soup
+    blocks = []
+    for node in root.find_all(BLOCK_TAGS):
+        if node.find_parent(BLOCK_TAGS) is not None:
+            continue  # Already part of an enclosing block
+        text = ' '.join(node.get_text(' ').split())
+        # Menus and captions are a few words long; body copy is made of sentences
+        if len(text.split()) >= 8:
+            blocks.append(text)
+    return ' '.join(blocks) if blocks else ' '.join(root.get_text(' ').split())
+
+def split_passages(text, words=EVIDENCE_PASSAGE_WORDS):
+    """Overlapping passages of about `words` words, advancing half a passage at a time"""
+    tokens = text.split()
+    if not tokens:
+        return []
+    step = max(1, words // 2)
+    return [' '.join(tokens[start:start + words]) for start in range(0, max(1, len(tokens) - step), step)]
+
+def rank_passages(claim, passages, k=EVIDENCE_PASSAGES):
+    """Indices of the k passages most similar to the claim by TF-IDF cosine, best first"""
+    if not passages:
+        return []
+    builder = EnhancedContextBuilder()
+    for passage in passages:
+        builder.add_statement(passage, None)
+    scores = builder.similarities([claim]).toarray().ravel()
+    k = min(k, len(passages))
+    top = np.argpartition(-scores, k - 1)[:k]
+    return [int(i) for i in top[np.argsort(-scores[top], kind='stable')] if scores[i] > 0]
+
+class EvidenceSearch:
+    def __init__(self, searcher, pages=EVIDENCE_PAGES, max_bytes=EVIDENCE_MAX_BYTES, timeout=EVIDENCE_TIMEOUT,
+                 passages=EVIDENCE_PASSAGES, passage_words=EVIDENCE_PASSAGE_WORDS, cache_path=None):
+        self.searcher = searcher
+        self.pages = pages
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.passages = passages
+        self.passage_words = passage_words
+        # Extracted page text, shared across claims that cite the same pages
+        self.page_cache = DiskCache(cache_path or os.path.join(CACHE_DIR, "pages.sqlite"), ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_SIZE)
+        self.inflight = {}
+
+    async def initialize(self):
+        await self.searcher.initialize()
+
+    async def close(self):
+        await self.searcher.close()
+
+    def cache_stats(self):
+        return {**self.searcher.cache_stats(), "page_cache": self.page_cache.stats()}
+
+    async def search(self, query, num_results=3, timeout=5):
+        results = await self.searcher.search(query, num_results, timeout)
+        return await self.add_evidence(query, results)
+
+    async def batch_search(self, queries):
+        await self.initialize()
+        return await asyncio.gather(*(self.search(query) for query in queries))
+
+    async def add_evidence(self, claim, results):
+        """Copies of `results` whose top pages carry their best-matching passages"""
+        try:
+            with tracer.span("evidence", claim=claim) as span:
+                texts = await asyncio.gather(*(self.page_text(result['link']) for result in results[:self.pages]))
+                sources = []
+                passages = []
+                for n, text in enumerate(texts):
+                    for passage in split_passages(text, self.passage_words):
+                        sources.append(n)
+                        passages.append(passage)
+                best = rank_passages(claim, passages, self.passages)
+                span.update(pages=sum(1 for text in texts if text), passages=len(best))
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            best = []
+
+        # The searcher's cached lists are shared, so never modify them in place
+        enriched = [dict(result, passages=[]) for result in results]
+        for i in best:
+            enriched[sources[i]]['passages'].append(passages[i])
+        return enriched
+
+    async def page_text(self, url):
+        if not url.startswith(('http://', 'https://')):
+            return ""
+        text = self.page_cache.get(url)
+        tracer.increment("page_cache_lookups", result="hit" if text is not None else "miss")
+        if text is not None:
+            return text
+        # Claims that share a source share one download
+        if url not in self.inflight:
+            task = asyncio.ensure_future(self._fetch_text(url))
+            self.inflight[url] = task
+            task.add_done_callback(lambda _: self.inflight.pop(url, None))
+        return await asyncio.shield(self.inflight[url])
+
+    async def _fetch_text(self, url):
+        await self.initialize()
+        headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'}
+        try:
+            async with self.searcher.session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=self.timeout)) as response:
+                if response.status != 200 or 'html' not in response.headers.get('Content-Type', 'text/html'):
+                    return ""
+                # Stop reading once the size cap is reached; the rest of a long page is rarely needed
+                body = bytearray()
+                async for chunk in response.content.iter_chunked(65536):
+                    body.extend(chunk)
+                    if len(body) >= self.max_bytes:
+                        break
+                html = bytes(body[:self.max_bytes]).decode(response.charset or 'utf-8', errors='replace')
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(None, extract_text, html)
+            self.page_cache.set(url, text)
+            return text
+        except asyncio.TimeoutError:
+            logger.warning(f"Timed out fetching evidence from {url}")
+            return ""
+        except (aiohttp.ClientError, UnicodeError, LookupError) as e:
+            logger.warning(f"Could not fetch evidence from {url}: {e}")
+            return ""
+
+    async def __aenter__(self):
+        await self.initialize()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
@@ -1,9 +1,68 @@
+import asyncio
 import json
-import streamlit as st
+import logging
+import os
+import re
 from groq import AsyncGroq
-from utils import GROQ_API_KEY, LLM_MODEL, format_web_results, FACT_CHECKING_ERROR, JSON_PARSING_ERROR, UNEXPECTED_ERROR
+from disk_cache import DiskCache, make_cache_key, normalize_text
+from tracing import tracer
+from utils import GROQ_API_KEY, LLM_MODEL, CACHE_DIR, BATCH_TOKEN_BUDGET, STREAM_LLM_RESPONSES, FACT_CHECK_CACHE_TTL, FACT_CHECK_CACHE_SIZE, format_web_results, FACT_CHECKING_ERROR, JSON_PARSING_ERROR, UNEXPECTED_ERROR, report_error
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = "You are a highly knowledgeable AI assistant specializing in quick, real-time fact-checking for debates, with access to recent web information and debate context."
+
+# Tokens reserved for each claim's JSON verdict
+RESPONSE_TOKENS_PER_CLAIM = 300
+
+REQUIRED_FIELDS = ["Verification", "Confidence", "Explanation", "Bias", "Sources", "Categories", "Sentiment"]
+ALLOWED_VALUES = {
+    "Verification": ("VERIFIED", "PARTIALLY VERIFIED", "NOT VERIFIED"),
+    "Confidence": ("HIGH", "MEDIUM", "LOW"),
+}
+
+def error_result(explanation):
+    """Verdict recorded when a check fails; "ERROR" is kept apart from real verdicts everywhere downstream"""
+    return {
+        "Verification": "ERROR",
+        "Confidence": "N/A",
+        "Explanation": explanation,
+        "Bias": "N/A",
+        "Sources": "N/A",
+        "Categories": "N/A",
+        "Sentiment": "N/A"
+    }
+
+# Parsed verdicts as JSON, shared across reruns, sessions and debates
+fact_check_cache = DiskCache(os.path.join(CACHE_DIR, "fact_checks.sqlite"), ttl=FACT_CHECK_CACHE_TTL, max_entries=FACT_CHECK_CACHE_SIZE)
+
+def fact_check_cache_key(statement, context, web_results):
+    results = [
+        (normalize_text(result.get('title', '')), normalize_text(result.get('snippet', '')), result.get('link', ''), result.get('passages', []))
+        for result in web_results
+    ]
+    return make_cache_key(normalize_text(statement), normalize_text(context), results, LLM_MODEL)
+
+def cache_verdict(cache_key, content):
+    """Parse a raw response and return the verdict as JSON, caching it only if it is a real verdict.
+
+    A response cut off at max_tokens or otherwise malformed parses to ERROR or
+    to an N/A verification; it is not cached, so the next run asks again
+    instead of reusing the failure.
+    """
+    result = parse_fact_check_result(content)
+    verdict = json.dumps(result)
+    if result["Verification"] in ALLOWED_VALUES["Verification"]:
+        fact_check_cache.set(cache_key, verdict)
+    return verdict
 
 async def fact_check_with_groq(groq_client, statement, context, web_results, categories, sentiment, status_queue):
+    cache_key = fact_check_cache_key(statement, context, web_results)
+    cached = fact_check_cache.get(cache_key)
+    tracer.increment("fact_check_cache_lookups", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        return cached
+
     web_info = format_web_results(web_results)
 
     prompt = f"""
@@ -41,94 +100,343 @@ async def fact_check_with_groq(groq_client, statement, context, web_results, cat
     }}
     ```
     """
-    print(f"Prompt sent to GROQ API:\n{prompt}")
+    logger.debug(f"Prompt sent to GROQ API:\n{prompt}")
 
     try:
-        response = await groq_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a highly knowledgeable AI assistant specializing in quick, real-time fact-checking for debates, with access to recent web information and debate context.",
-                },
-                {
-                    "role": "user",
-                    "content": prompt,
-                }
-            ],
-            model=LLM_MODEL,  
-            temperature=0.1,
-            max_tokens=300,
-            top_p=1,
-        )
-        print(f"Response received from GROQ API:\n{response.choices[0].message.content}")
-        return response.choices[0].message.content
+        with tracer.span("llm", claim=statement, prompt_tokens=estimate_tokens(SYSTEM_PROMPT + prompt)) as span:
+            started = asyncio.get_running_loop().time()
+            response = await groq_client.chat.completions.create(
+                messages=[
+                    {
+                        "role": "system",
+                        "content": SYSTEM_PROMPT,
+                    },
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+                model=LLM_MODEL,  
+                temperature=0.1,
+                max_tokens=RESPONSE_TOKENS_PER_CLAIM,
+                top_p=1,
+                stream=STREAM_LLM_RESPONSES,
+            )
+            if STREAM_LLM_RESPONSES:
+                # Surface Verification and Confidence as soon as they are complete in the stream
+                parser = FactCheckStreamParser()
+                parts = []
+                async for chunk in response:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if not delta:
+                        continue
+                    parts.append(delta)
+                    for field, value in parser.feed(delta):
+                        span.setdefault("first_verdict_seconds", asyncio.get_running_loop().time() - started)
+                        if status_queue is not None:
+                            await status_queue.put((statement, field, value))
+                content = "".join(parts)
+                span["completion_tokens"] = estimate_tokens(content)
+            else:
+                content = response.choices[0].message.content
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    span["prompt_tokens"] = usage.prompt_tokens
+                    span["completion_tokens"] = usage.completion_tokens
+                else:
+                    span["completion_tokens"] = estimate_tokens(content)
+            tracer.increment("llm_tokens", span["prompt_tokens"], kind="prompt")
+            tracer.increment("llm_tokens", span["completion_tokens"], kind="completion")
+        logger.debug(f"Response received from GROQ API:\n{content}")
+        return cache_verdict(cache_key, content)
 
     except Exception as e:
-        st.error(FACT_CHECKING_ERROR.format(str(e)))
-        return json.dumps({
-            "Verification": "ERROR",
-            "Confidence": "N/A",
-            "Explanation": FACT_CHECKING_ERROR.format(str(e)),
-            "Bias": "N/A",
-            "Sources": "N/A",
-            "Categories": "N/A",
-            "Sentiment": "N/A"
-        })
+        report_error(FACT_CHECKING_ERROR.format(str(e)))
+        return json.dumps(error_result(FACT_CHECKING_ERROR.format(str(e))))
 
-def parse_fact_check_result(result_string):
+def estimate_tokens(text):
+    """Rough token count (about four characters per token) used for batch planning"""
+    return len(text) // 4 + 1
+
+def format_batch_claim(number, item):
+    return f"""
+    ### Claim {number}
+
+    **Context Summary:** {item['context']}
+
+    **Statement to Verify:** {item['statement']}
+
+    **Web Search Results:**
+    {format_web_results(item['web_results'])}
+
+    **Categories:** {', '.join(item['categories'])}
+
+    **Sentiment Score:** {item['sentiment']}
+    """
+
+BATCH_INSTRUCTIONS = """
+    ## Instructions:
+
+    1. Verify each statement independently, based on its own context and web search results.
+    2. Assess the credibility of the sources in the web search results.
+    3. Look for signs of bias in the statement and the sources.
+    4. Consider the categories and sentiment score in your analysis.
+
+    ## Response Format:
+
+    Respond with a single JSON array containing exactly one object per claim, in claim order:
+
+    ```json
+    [
+      {
+        "Claim": 1,
+        "Verification": "[VERIFIED, PARTIALLY VERIFIED, NOT VERIFIED]",
+        "Confidence": "[HIGH, MEDIUM, LOW]",
+        "Explanation": "[Your concise explanation]",
+        "Bias": "[Any detected bias or 'None detected']",
+        "Sources": "[List of relevant sources with URLs]"
+      }
+    ]
+    ```
+    """
+
+def plan_batches(items, token_budget=BATCH_TOKEN_BUDGET):
+    """Greedily pack item indices into batches whose prompt and response fit the token budget"""
+    overhead = estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(BATCH_INSTRUCTIONS)
+    batches = []
+    current = []
+    used = overhead
+    for i, item in enumerate(items):
+        cost = estimate_tokens(format_batch_claim(len(current) + 1, item)) + RESPONSE_TOKENS_PER_CLAIM
+        if current and used + cost > token_budget:
+            batches.append(current)
+            current = []
+            used = overhead
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_batch_result(result_string, expected):
+    """Split a batch response into one JSON string per claim, or return None if it is unusable"""
     try:
-        # Remove any leading/trailing whitespace and backticks
         result_string = result_string.strip().strip('`')
-        
-        # If the string starts with "json", remove it
         if result_string.startswith('json'):
             result_string = result_string[4:].strip()
-        
-        # Parse the JSON string
-        result = json.loads(result_string)
-        
-        # Ensure all required fields are present
-        required_fields = ["Verification", "Confidence", "Explanation", "Bias", "Sources", "Categories", "Sentiment"]
-        for field in required_fields:
-            if field not in result:
-                result[field] = "N/A"
-        
+        results = json.loads(result_string)
+        if not isinstance(results, list) or len(results) != expected or not all(isinstance(r, dict) for r in results):
+            return None
+        if all('Claim' in r for r in results):
+            results.sort(key=lambda r: int(r['Claim']))
+        for r in results:
+            r.pop('Claim', None)
+        return [json.dumps(r) for r in results]
+    except (ValueError, TypeError) as e:
+        report_error(JSON_PARSING_ERROR.format(str(e)))
+        logger.debug(f"Unparseable batch response: {result_string}")
+        return None
+
+async def fact_check_batch_with_groq(groq_client, items, token_budget=BATCH_TOKEN_BUDGET):
+    """Fact-check many claims with as few requests as the token budget allows.
+
+    Each item is a dict with statement, context, web_results, categories and
+    sentiment. Returns one JSON result string per item, in order. Batches whose
+    response cannot be parsed fall back to single-claim requests.
+    """
+    results = [None] * len(items)
+    cache_keys = [fact_check_cache_key(item['statement'], item['context'], item['web_results']) for item in items]
+    pending = []
+    for i, key in enumerate(cache_keys):
+        cached = fact_check_cache.get(key)
+        tracer.increment("fact_check_cache_lookups", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.append(i)
+
+    async def check_single(i):
+        item = items[i]
+        results[i] = await fact_check_with_groq(groq_client, item['statement'], item['context'], item['web_results'], item['categories'], item['sentiment'], None)
+
+    async def check_batch(batch):
+        if len(batch) == 1:
+            await check_single(batch[0])
+            return
+
+        claims = "".join(format_batch_claim(number, items[i]) for number, i in enumerate(batch, 1))
+        prompt = f"""
+    ## Batch Fact-Checking Request
+
+    There are {len(batch)} claims below.
+    {claims}
+    {BATCH_INSTRUCTIONS}"""
+        logger.debug(f"Batch prompt sent to GROQ API ({len(batch)} claims):\n{prompt}")
+
+        parsed = None
+        try:
+            with tracer.span("llm", claims=len(batch), prompt_tokens=estimate_tokens(SYSTEM_PROMPT + prompt)) as span:
+                response = await groq_client.chat.completions.create(
+                    messages=[
+                        {"role": "system", "content": SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt},
+                    ],
+                    model=LLM_MODEL,
+                    temperature=0.1,
+                    max_tokens=RESPONSE_TOKENS_PER_CLAIM * len(batch),
+                    top_p=1,
+                )
+                content = response.choices[0].message.content
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    span["prompt_tokens"] = usage.prompt_tokens
+                    span["completion_tokens"] = usage.completion_tokens
+                else:
+                    span["completion_tokens"] = estimate_tokens(content)
+                tracer.increment("llm_tokens", span["prompt_tokens"], kind="prompt")
+                tracer.increment("llm_tokens", span["completion_tokens"], kind="completion")
+            logger.debug(f"Batch response received from GROQ API:\n{content}")
+            with tracer.span("parse", claims=len(batch)):
+                parsed = parse_batch_result(content, len(batch))
+        except Exception as e:
+            report_error(FACT_CHECKING_ERROR.format(str(e)))
+
+        if parsed is None:
+            # Fall back to one request per claim
+            logger.warning(f"Batch of {len(batch)} claims failed, retrying them one at a time")
+            await asyncio.gather(*(check_single(i) for i in batch))
+            return
+
+        for i, result in zip(batch, parsed):
+            results[i] = cache_verdict(cache_keys[i], result)
+
+    pending_items = [items[i] for i in pending]
+    batches = [[pending[j] for j in batch] for batch in plan_batches(pending_items, token_budget)]
+    await asyncio.gather(*(check_batch(batch) for batch in batches))
+    return results
+
+class FactCheckStreamParser:
+    """Incrementally picks the Verification and Confidence fields out of a streamed JSON verdict"""
+
+    FIELD_PATTERN = re.compile(r'"(Verification|Confidence)"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+    def __init__(self):
+        self.buffer = ""
+        self.fields = {}
+        self.scanned = 0
+
+    def feed(self, text):
+        """Add streamed text; returns (field, value) pairs that completed with it"""
+        self.buffer += text
+        completed = []
+        # A field can only complete in the new text, so rescan from a little before it
+        for match in self.FIELD_PATTERN.finditer(self.buffer, max(0, self.scanned - 512)):
+            field = match.group(1)
+            if field not in self.fields:
+                try:
+                    value = json.loads(f'"{match.group(2)}"')
+                except ValueError:
+                    value = match.group(2)
+                self.fields[field] = value
+                completed.append((field, value))
+        self.scanned = len(self.buffer)
+        return completed
+
+def _matching_brace(text, start):
+    """Index just past the brace closing the one at `start`, ignoring braces inside strings; None if unclosed"""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        char = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return i + 1
+    return None
+
+def extract_json_object(text):
+    """The first {...} in a model response, without code fences or the prose around it"""
+    start = text.find('{')
+    if start == -1:
+        return text.strip().strip('`')
+    try:
+        _, end = json.JSONDecoder().raw_decode(text, start)
+        return text[start:end]
+    except json.JSONDecodeError:
+        pass
+    # Malformed or truncated: keep up to the matching brace, or everything left for repair_json
+    end = _matching_brace(text, start)
+    if end is not None:
+        return text[start:end]
+    return text[start:].rstrip().rstrip('`').rstrip()
+
+def repair_json(text):
+    """One cheap repair pass: drop trailing commas and close an unterminated string, object or array"""
+    text = re.sub(r',\s*([}\]])', r'\1', text)
+    stack = []
+    in_string = False
+    escaped = False
+    for char in text:
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+        elif char in '}]' and stack:
+            stack.pop()
+    if in_string:
+        text += '"'
+    text = re.sub(r',\s*$', '', text)
+    return text + ''.join(reversed(stack))
+
+def validate_fact_check(result):
+    """Check a parsed verdict against the response schema, filling and normalising fields"""
+    if not isinstance(result, dict):
+        raise ValueError(f"expected a JSON object, got {type(result).__name__}")
+    for field in REQUIRED_FIELDS:
+        if field not in result:
+            result[field] = "N/A"
+    if str(result["Verification"]).strip().upper() == "ERROR":
+        # Failure records from this module; normalising would pass them off as real verdicts
+        result["Verification"] = "ERROR"
         return result
-    except json.JSONDecodeError as e:
+    for field, allowed in ALLOWED_VALUES.items():
+        value = str(result[field]).strip().strip('[]').upper()
+        result[field] = value if value in allowed else "N/A"
+    return result
+
+def parse_fact_check_result(result_string):
+    try:
+        candidate = extract_json_object(result_string)
+        try:
+            result = json.loads(candidate)
+        except json.JSONDecodeError:
+            tracer.increment("json_repairs")
+            result = json.loads(repair_json(candidate))
+        return validate_fact_check(result)
+    except (json.JSONDecodeError, ValueError) as e:
+        tracer.increment("json_parse_errors")
         print(f"JSON parsing error: {str(e)}")
-        print(f"Problematic JSON string: {result_string}")
-        # Attempt to extract partial information
-        partial_result = {}
-        for field in ["Verification", "Confidence", "Explanation", "Bias", "Sources", "Categories", "Sentiment"]:
-            field_start = result_string.find(f'"{field}":')
-            if field_start != -1:
-                field_end = result_string.find(',', field_start)
-                if field_end == -1:
-                    field_end = result_string.find('}', field_start)
-                if field_end != -1:
-                    partial_result[field] = result_string[field_start:field_end].split(':')[1].strip().strip('"')
-        
-        if partial_result:
-            print(f"Extracted partial result: {partial_result}")
-            return partial_result
-        else:
-            return {
-                "Verification": "ERROR",
-                "Confidence": "N/A",
-                "Explanation": JSON_PARSING_ERROR.format(str(e)),
-                "Bias": "N/A",
-                "Sources": "N/A",
-                "Categories": "N/A",
-                "Sentiment": "N/A"
-            }
+        logger.debug(f"Problematic JSON string: {result_string}")
+        return error_result(JSON_PARSING_ERROR.format(str(e)))
     except Exception as e:
         print(UNEXPECTED_ERROR.format(str(e)))
-        return {
-            "Verification": "ERROR",
-            "Confidence": "N/A",
-            "Explanation": UNEXPECTED_ERROR.format(str(e)),
-            "Bias": "N/A",
-            "Sources": "N/A",
-            "Categories": "N/A",
-            "Sentiment": "N/A"
-        }
\ No newline at end of file
+        return error_result(UNEXPECTED_ERROR.format(str(e)))
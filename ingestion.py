@@ -0,0 +1,295 @@
+"""Audio ingestion: each recording is written to disk once and read through memory maps.
+
+`ingest_audio` stores an upload as a 16-bit mono WAV under CACHE_DIR/audio,
+named by its content hash, and returns an IngestedAudio whose `samples` is a
+read-only numpy.memmap over the file's data chunk. Transcription and
+diarization slice that map instead of each holding a copy of the PCM. Ingestion
+also runs a cheap voice-activity detector (frame energy and zero-crossing rate)
+so silence and applause are skipped before any model sees the audio.
+"""
+import asyncio
+import hashlib
+import os
+import struct
+import tempfile
+import time
+import wave
+from bisect import bisect_right
+import numpy as np
+from tracing import tracer
+from utils import (CACHE_DIR, AUDIO_CACHE_FILES, AUDIO_CACHE_MAX_AGE, VAD_ENABLED, VAD_FRAME, VAD_THRESHOLD_DB, VAD_MAX_ZCR,
+                   VAD_MIN_SILENCE, VAD_MIN_SPEECH, VAD_PADDING, report_progress)
+
+AUDIO_DIR = os.path.join(CACHE_DIR, "audio")
+BLOCK_FRAMES = 1 << 20  # Frames converted or scanned per step, so memory use stays flat
+MIN_SPEECH_DB = -60.0  # Frames quieter than this (dBFS) are never speech
+
+def to_mono_int16(frames, sample_width, channels):
+    """Convert raw little-endian PCM frames to mono 16-bit samples"""
+    if sample_width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.int16) - 128) << 8
+    elif sample_width == 2:
+        samples = np.frombuffer(frames, dtype="<i2")
+    elif sample_width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = ((raw[:, 2].astype(np.int8).astype(np.int32) << 8) | raw[:, 1]).astype(np.int16)
+    elif sample_width == 4:
+        samples = (np.frombuffer(frames, dtype="<i4") >> 16).astype(np.int16)
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return samples
+
+def wav_data_chunk(path):
+    """Byte offset and length of the data chunk in a RIFF/WAVE file"""
+    with open(path, "rb") as f:
+        riff, _, wave_id = struct.unpack("<4sI4s", f.read(12))
+        if riff != b"RIFF" or wave_id != b"WAVE":
+            raise ValueError(f"Not a WAV file: {path}")
+        size = os.fstat(f.fileno()).st_size
+        while True:
+            header = f.read(8)
+            if len(header) < 8:
+                raise ValueError(f"WAV file has no data chunk: {path}")
+            chunk_id, chunk_size = struct.unpack("<4sI", header)
+            if chunk_id == b"data":
+                offset = f.tell()
+                # Streamed recordings may leave the size unset; the data then runs to the end of the file
+                return offset, min(chunk_size, size - offset)
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+def frame_features(samples, frame_size):
+    """Energy (dBFS) and zero-crossing rate of each `frame_size`-sample frame, computed block by block"""
+    n_frames = len(samples) // frame_size
+    energy = np.empty(n_frames, dtype=np.float32)
+    zcr = np.empty(n_frames, dtype=np.float32)
+    step = max(1, BLOCK_FRAMES // frame_size)
+    for first in range(0, n_frames, step):
+        last = min(n_frames, first + step)
+        block = np.asarray(samples[first * frame_size:last * frame_size], dtype=np.float32).reshape(-1, frame_size) / 32768.0
+        energy[first:last] = 10 * np.log10(np.mean(np.square(block), axis=1) + 1e-10)
+        signs = np.signbit(block)
+        zcr[first:last] = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / (frame_size - 1)
+    return energy, zcr
+
+def detect_speech(samples, sample_rate, frame=VAD_FRAME, threshold_db=VAD_THRESHOLD_DB, max_zcr=VAD_MAX_ZCR,
+                  min_silence=VAD_MIN_SILENCE, min_speech=VAD_MIN_SPEECH, padding=VAD_PADDING):
+    """Speech regions as (start, end) sample offsets.
+
+    A frame counts as speech when its energy is well above the recording's
+    noise floor and its zero-crossing rate is at most `max_zcr`: applause and
+    crowd noise are loud, but cross zero far more often than voiced speech.
+    Gaps shorter than `min_silence` seconds are bridged, bursts shorter than
+    `min_speech` seconds dropped and regions padded by `padding` seconds.
+    """
+    total = len(samples)
+    frame_size = max(2, int(frame * sample_rate))
+    if total < frame_size:
+        return [(0, total)] if total else []
+
+    energy, zcr = frame_features(samples, frame_size)
+    floor, loud = np.percentile(energy, [10, 90])
+    # Recordings with little dynamic range (no real pauses) get a proportionally lower bar
+    threshold = max(MIN_SPEECH_DB, floor + min(threshold_db, (loud - floor) / 2))
+    voiced = (energy >= threshold) & (zcr <= max_zcr)
+
+    # Runs of speech frames, from the rising and falling edges of the mask
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], voiced.astype(np.int8), [0]))))
+    runs = []
+    max_gap = min_silence * sample_rate / frame_size
+    for start, end in edges.reshape(-1, 2).tolist():
+        if runs and start - runs[-1][1] < max_gap:
+            runs[-1][1] = end
+        else:
+            runs.append([start, end])
+
+    regions = []
+    min_frames = min_speech * sample_rate / frame_size
+    pad = int(padding * sample_rate)
+    for start, end in runs:
+        if end - start < min_frames:
+            continue
+        start, end = max(0, start * frame_size - pad), min(total, end * frame_size + pad)
+        if regions and start <= regions[-1][1]:
+            regions[-1] = (regions[-1][0], end)
+        else:
+            regions.append((start, end))
+    return regions
+
+class SpeechMap:
+    """Maps a timeline made of the speech regions laid end to end back onto the recording"""
+
+    def __init__(self, regions):
+        self.regions = [(int(start), int(end)) for start, end in regions if end > start]
+        self.offsets = [0]
+        for start, end in self.regions:
+            self.offsets.append(self.offsets[-1] + end - start)
+        self.length = self.offsets[-1]
+
+    def to_original(self, start, end):
+        """Sample ranges of the recording covered by [start, end) of the speech timeline"""
+        ranges = []
+        i = max(0, bisect_right(self.offsets, start) - 1)
+        while i < len(self.regions) and self.offsets[i] < end:
+            region_start, region_end = self.regions[i]
+            low = region_start + max(0, start - self.offsets[i])
+            high = min(region_end, region_start + end - self.offsets[i])
+            if high > low:
+                ranges.append((low, high))
+            i += 1
+        return ranges
+
+    def gather(self, samples, start, end):
+        """Samples [start, end) of the speech timeline; a copy, since the regions are not contiguous"""
+        pieces = [samples[low:high] for low, high in self.to_original(start, end)]
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=samples.dtype)
+
+class IngestedAudio:
+    """A 16-bit mono WAV on disk, its memory-mapped samples and the speech regions found in it"""
+
+    def __init__(self, path, digest, regions=None):
+        self.path = path
+        self.digest = digest
+        with wave.open(path, "rb") as wav:
+            self.sample_rate = wav.getframerate()
+        offset, length = wav_data_chunk(path)
+        if length >= 2:
+            self.samples = np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(length // 2,))
+        else:
+            self.samples = np.zeros(0, dtype="<i2")
+        if regions is None:
+            regions = detect_speech(self.samples, self.sample_rate) if VAD_ENABLED else [(0, len(self.samples))]
+        self.regions = [tuple(region) for region in regions]
+
+    def __reduce__(self):
+        # Worker processes reopen the map instead of receiving a pickled copy of the samples
+        return (IngestedAudio, (self.path, self.digest, self.regions))
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def speech_seconds(self):
+        return sum(end - start for start, end in self.regions) / self.sample_rate
+
+    def speech_map(self):
+        return SpeechMap(self.regions)
+
+def _write_upload(audio_file, directory):
+    """Copy an upload to a temporary file in `directory`, hashing it on the way; returns (path, digest)"""
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=directory, suffix=".upload", delete=False) as f:
+        if isinstance(audio_file, (bytes, bytearray, memoryview)):
+            digest.update(audio_file)
+            f.write(audio_file)
+        elif hasattr(audio_file, "getbuffer"):
+            # Streamlit uploads are BytesIO objects; write their buffer without copying it
+            with audio_file.getbuffer() as view:
+                digest.update(view)
+                f.write(view)
+        else:
+            audio_file.seek(0)
+            for block in iter(lambda: audio_file.read(BLOCK_FRAMES), b""):
+                digest.update(block)
+                f.write(block)
+            audio_file.seek(0)
+    return f.name, digest.hexdigest()
+
+def _hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(BLOCK_FRAMES), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def convert_wav(source, path):
+    """Write `source` to `path` as a 16-bit mono WAV, a block of frames at a time"""
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with wave.open(source, "rb") as src, wave.open(temporary, "wb") as dst:
+        sample_width, channels = src.getsampwidth(), src.getnchannels()
+        dst.setnchannels(1)
+        dst.setsampwidth(2)
+        dst.setframerate(src.getframerate())
+        while True:
+            frames = src.readframes(BLOCK_FRAMES)
+            if not frames:
+                break
+            dst.writeframes(to_mono_int16(frames, sample_width, channels).astype("<i2").tobytes())
+    os.replace(temporary, path)
+
+def _prune(directory, keep, max_files=AUDIO_CACHE_FILES, max_age=AUDIO_CACHE_MAX_AGE):
+    """Delete the least recently used recordings beyond `max_files`, but only those idle for `max_age` seconds.
+
+    Diarization workers reopen a recording by path while it is being analyzed,
+    so a file ingested or reused recently is kept even when over the count.
+    """
+    paths = []
+    for name in os.listdir(directory):
+        if name.endswith(".wav"):
+            path = os.path.join(directory, name)
+            try:
+                paths.append((os.path.getmtime(path), path))
+            except OSError:
+                continue  # Pruned by another session meanwhile
+    paths.sort(reverse=True)
+    cutoff = time.time() - max_age
+    for modified, path in paths[max_files:]:
+        if path != keep and modified < cutoff:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # Still mapped by another session (Windows refuses to delete it)
+
+def ingest_audio(audio_file, directory=None):
+    """Store a WAV (path, bytes, or uploaded file) on disk once and memory-map it.
+
+    Recordings already in 16-bit mono are used as they are: uploads are moved
+    into the audio cache and paths are mapped in place. Anything else is
+    converted block by block. Files are named by content hash, so re-running
+    the same recording reuses the stored copy.
+    """
+    if isinstance(audio_file, IngestedAudio):
+        return audio_file
+    directory = directory or AUDIO_DIR
+    os.makedirs(directory, exist_ok=True)
+    if isinstance(audio_file, (str, os.PathLike)):
+        source, digest, uploaded = os.fspath(audio_file), _hash_file(audio_file), False
+    else:
+        (source, digest), uploaded = _write_upload(audio_file, directory), True
+
+    path = os.path.join(directory, f"{digest}.wav")
+    in_place = False
+    try:
+        if os.path.exists(path):
+            os.utime(path)
+        else:
+            with wave.open(source, "rb") as wav:
+                native = wav.getsampwidth() == 2 and wav.getnchannels() == 1
+            if native and not uploaded:
+                path, in_place = source, True
+            elif native:
+                os.replace(source, path)
+            else:
+                convert_wav(source, path)
+    finally:
+        if uploaded and os.path.exists(source):
+            os.remove(source)
+    if not in_place:
+        _prune(directory, path)
+    return IngestedAudio(path, digest)
+
+async def load_audio(audio_file):
+    """`ingest_audio` off the event loop, traced; IngestedAudio passes straight through"""
+    if isinstance(audio_file, IngestedAudio):
+        return audio_file
+    with tracer.span("ingestion") as span:
+        loop = asyncio.get_running_loop()
+        audio = await loop.run_in_executor(None, ingest_audio, audio_file)
+        span.update(audio_seconds=audio.duration, speech_seconds=audio.speech_seconds)
+    skipped = audio.duration - audio.speech_seconds
+    if skipped >= 1:
+        report_progress(f"Skipping {skipped:.0f} of {audio.duration:.0f} seconds as silence or applause")
+    return audio
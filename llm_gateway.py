@@ -0,0 +1,307 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import logging
+import random
+import threading
+import time
+from collections import deque
+import groq
+from utils import GROQ_API_KEY, GROQ_BASE_URL, GROQ_REQUESTS_PER_MINUTE, GROQ_TOKENS_PER_MINUTE, LLM_MAX_RETRIES
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = 0
+BATCH = 1
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx responses
+RETRYABLE_ERRORS = tuple(
+    error for error in (
+        getattr(groq, "RateLimitError", None),
+        getattr(groq, "APITimeoutError", None),
+        getattr(groq, "APIConnectionError", None),
+        getattr(groq, "InternalServerError", None),
+    ) if error is not None
+)
+
+def estimate_request_tokens(kwargs):
+    """Prompt characters / 4 plus the completion budget, as an upper bound for scheduling"""
+    prompt = sum(len(str(message.get("content", ""))) for message in kwargs.get("messages", []))
+    return prompt // 4 + 1 + kwargs.get("max_tokens", 0)
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.level = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount):
+        self.refill()
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class LLMGateway:
+    """Shared front door for Groq chat completions.
+
+    Enforces requests-per-minute and tokens-per-minute budgets, admits waiting
+    requests in priority order, retries transient failures with jittered
+    exponential backoff, and keeps queue and latency metrics. It mirrors
+    `client.chat.completions.create`, so it can be passed anywhere an AsyncGroq
+    client is expected.
+
+    Budgets and the queue belong to the gateway, not to an event loop, so one
+    instance can serve several loops (Streamlit runs each rerun and session in
+    its own). Priorities order requests queued on the same instance: uploaded
+    recordings and batch runs go through `with_priority(BATCH)`, so live
+    sessions (INTERACTIVE, the default) overtake their queued requests.
+    Separate processes have separate gateways.
+    Pass `client_factory` instead of `client` when the gateway outlives an
+    event loop; AsyncGroq's connection pool is tied to the loop that opened it.
+    """
+
+    def __init__(self, client=None, requests_per_minute=GROQ_REQUESTS_PER_MINUTE, tokens_per_minute=GROQ_TOKENS_PER_MINUTE,
+                 max_retries=LLM_MAX_RETRIES, base_delay=1.0, max_delay=30.0, priority=INTERACTIVE, client_factory=None):
+        self.client = client
+        self.client_factory = client_factory
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.priority = priority
+        self.queue = []
+        self.sequence = itertools.count()
+        # Guards the queue and buckets; each event loop waits on its own Condition
+        self.lock = threading.Lock()
+        self.conditions = {}
+        self.clients = {}
+        self.paused_until = 0.0
+        self.in_flight = 0
+        self.counters = {"requests": 0, "retries": 0, "failures": 0, "rate_limited": 0}
+        self.latencies = deque(maxlen=1000)
+        self.queue_waits = deque(maxlen=1000)
+        self.chat = _Chat(self, priority)
+
+    def with_priority(self, priority):
+        """A view of this gateway whose requests are queued at `priority` (sharing the same budgets)"""
+        return _PriorityView(self, priority)
+
+    def _loop_state(self, loop):
+        # Called with self.lock held; state left behind by finished loops is dropped
+        for closed in [other for other in self.conditions if other.is_closed()]:
+            del self.conditions[closed]
+            self.clients.pop(closed, None)
+        if loop not in self.conditions:
+            self.conditions[loop] = asyncio.Condition()
+        return self.conditions[loop]
+
+    def _client(self):
+        if self.client_factory is None:
+            return self.client
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            self._loop_state(loop)
+            if loop not in self.clients:
+                self.clients[loop] = self.client_factory()
+            return self.clients[loop]
+
+    def _wake(self, current):
+        """Wake waiters on every loop; the caller holds the Condition of `current`"""
+        with self.lock:
+            conditions = list(self.conditions.items())
+        for loop, condition in conditions:
+            if loop is current:
+                condition.notify_all()
+                continue
+            notify = _notify_all(condition)
+            try:
+                loop.call_soon_threadsafe(loop.create_task, notify)
+            except RuntimeError:
+                notify.close()  # That loop has already closed
+
+    async def _acquire(self, priority, cost):
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            condition = self._loop_state(loop)
+        entry = (priority, next(self.sequence), cost, loop)
+        enqueued = time.monotonic()
+        async with condition:
+            with self.lock:
+                heapq.heappush(self.queue, entry)
+            try:
+                while True:
+                    wait = None
+                    with self.lock:
+                        # A loop that closed while queued can no longer claim its turn
+                        while self.queue[0] is not entry and self.queue[0][3].is_closed():
+                            heapq.heappop(self.queue)
+                        if self.queue[0] is entry:
+                            wait = max(
+                                self.paused_until - time.monotonic(),
+                                self.requests.wait_time(1),
+                                self.tokens.wait_time(cost),
+                            )
+                            if wait <= 0:
+                                heapq.heappop(self.queue)
+                                self.requests.take(1)
+                                self.tokens.take(cost)
+                                self.queue_waits.append(time.monotonic() - enqueued)
+                    if wait is not None and wait <= 0:
+                        self._wake(loop)
+                        return
+                    try:
+                        await asyncio.wait_for(condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+            except BaseException:
+                with self.lock:
+                    removed = entry in self.queue
+                    if removed:
+                        self.queue.remove(entry)
+                        heapq.heapify(self.queue)
+                if removed:
+                    self._wake(loop)
+                raise
+
+    def _sync_with_headers(self, headers):
+        # Groq reports the server-side view of the budgets; never assume more headroom than it does
+        with self.lock:
+            self._limit_to_headers(headers)
+
+    def _limit_to_headers(self, headers):
+        try:
+            remaining_tokens = headers.get("x-ratelimit-remaining-tokens")
+            if remaining_tokens is not None:
+                self.tokens.refill()
+                self.tokens.level = min(self.tokens.level, float(remaining_tokens))
+            remaining_requests = headers.get("x-ratelimit-remaining-requests")
+            if remaining_requests is not None:
+                self.requests.refill()
+                self.requests.level = min(self.requests.level, float(remaining_requests))
+        except (TypeError, ValueError):
+            pass
+
+    def _backoff(self, attempt, error):
+        retry_after = None
+        response = getattr(error, "response", None)
+        if response is not None:
+            try:
+                retry_after = float(response.headers.get("retry-after"))
+            except (TypeError, ValueError):
+                retry_after = None
+        if retry_after is not None:
+            return min(self.max_delay, retry_after)
+        # Full jitter: anywhere between zero and the exponential cap
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def create(self, priority=None, **kwargs):
+        priority = self.priority if priority is None else priority
+        cost = estimate_request_tokens(kwargs)
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(priority, cost)
+            self.in_flight += 1
+            start = time.monotonic()
+            try:
+                raw = await self._client().chat.completions.with_raw_response.create(**kwargs)
+                response = raw.parse()
+                if inspect.isawaitable(response):
+                    response = await response  # Newer SDKs return an async response wrapper
+                self._sync_with_headers(raw.headers)
+                # Streamed responses carry no usage, and latency here is time to the first byte
+                usage = getattr(response, "usage", None)
+                if usage is not None and getattr(usage, "total_tokens", None) is not None:
+                    # Refund what the estimate over-reserved
+                    with self.lock:
+                        self.tokens.give(max(0, cost - usage.total_tokens))
+                self.counters["requests"] += 1
+                self.latencies.append(time.monotonic() - start)
+                return response
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, getattr(groq, "RateLimitError", ())):
+                    self.counters["rate_limited"] += 1
+                if attempt >= self.max_retries:
+                    self.counters["failures"] += 1
+                    raise
+                delay = self._backoff(attempt, e)
+                self.counters["retries"] += 1
+                if isinstance(e, getattr(groq, "RateLimitError", ())):
+                    # Hold every queued request, not just this one
+                    self.paused_until = max(self.paused_until, time.monotonic() + delay)
+                logger.warning(f"Groq request failed ({type(e).__name__}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception:
+                self.counters["failures"] += 1
+                raise
+            finally:
+                self.in_flight -= 1
+
+    def metrics(self):
+        def percentile(values, q):
+            if not values:
+                return None
+            ordered = sorted(values)
+            return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+        with self.lock:
+            self.requests.refill()
+            self.tokens.refill()
+        return {
+            **self.counters,
+            "queue_depth": len(self.queue),
+            "in_flight": self.in_flight,
+            "latency_p50": percentile(self.latencies, 0.5),
+            "latency_p95": percentile(self.latencies, 0.95),
+            "queue_wait_p50": percentile(self.queue_waits, 0.5),
+            "queue_wait_p95": percentile(self.queue_waits, 0.95),
+            "requests_available": self.requests.level,
+            "tokens_available": self.tokens.level,
+        }
+
+async def _notify_all(condition):
+    async with condition:
+        condition.notify_all()
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+def get_gateway():
+    """The process-wide Groq gateway, so every Streamlit rerun and session draws on one set of budgets"""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway(client_factory=lambda: groq.AsyncGroq(
+                api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, max_retries=0))
+    return _gateway
+
+class _Completions:
+    def __init__(self, gateway, priority):
+        self.gateway = gateway
+        self.priority = priority
+
+    async def create(self, **kwargs):
+        return await self.gateway.create(priority=self.priority, **kwargs)
+
+class _Chat:
+    def __init__(self, gateway, priority):
+        self.completions = _Completions(gateway, priority)
+
+class _PriorityView:
+    def __init__(self, gateway, priority):
+        self.gateway = gateway
+        self.chat = _Chat(gateway, priority)
+
+    def metrics(self):
+        return self.gateway.metrics()
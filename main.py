@@ -1,35 +1,50 @@
 import streamlit as st
-import speech_recognition as sr
 import asyncio
-from groq import AsyncGroq
+import time
 from dotenv import load_dotenv
-import os
-import traceback
 from web_search import EfficientWebSearch
-from fact_checking import fact_check_with_groq, parse_fact_check_result
-import plotly.graph_objs as go
-import spacy
-from pyannote.audio import Pipeline
-from utils import GROQ_API_KEY, SPACY_MODEL, sentiment_to_percentage, get_verification_counts
-from audio_processing import process_audio, analyze_sentiment, identify_speaker
+from evidence import EvidenceSearch
+import pandas as pd
+from visualizations import create_truth_meter, create_verification_pie, create_network_graph
+from utils import FETCH_EVIDENCE, METRICS_PORT, MICROPHONE_ERROR, get_verification_counts, set_reporter
 from context_builder import EnhancedContextBuilder
+from model_registry import models
+from pipeline import analyze_recording
+from streaming import StreamingSession, microphone_frames
+from llm_gateway import get_gateway, BATCH
+from tracing import tracer, serve_metrics
+from results_store import get_results_store
 
 # Load environment variables
 load_dotenv()
 
 # Initialize components
-groq_client = AsyncGroq(api_key=GROQ_API_KEY)
-r = sr.Recognizer()
+# Every LLM call goes through one gateway that owns retries and the Groq rate budgets;
+# it is created once per process, so reruns and concurrent sessions share the budgets
+groq_client = get_gateway()
 web_searcher = EfficientWebSearch()
+# Uploaded recordings also pull passages from the top result pages; live mode keeps
+# to snippets so verdicts are not held up by page downloads
+evidence_searcher = EvidenceSearch(web_searcher) if FETCH_EVIDENCE else web_searcher
 
-# Initialize NLP models
-nlp = spacy.load(SPACY_MODEL)
-auth_token = os.getenv("HUGGINGFACE_TOKEN")
-diarization_pipeline = Pipeline.from_pretrained("pyannote/speaker-diarization", use_auth_token=auth_token)
+# NLP models load lazily in the background and are shared across reruns;
+# diarization loads in its own worker process
+models.warm_up(["spacy"])
 
 # Initialize context builder
 context_builder = EnhancedContextBuilder()
 
+# Every analyzed debate is saved, so results survive restarts and statistics are database queries;
+# the connection is opened once per process and shared by every rerun
+results_store = get_results_store()
+
+# Stage timings can be scraped by Prometheus; the server starts once per process
+if METRICS_PORT:
+    serve_metrics(METRICS_PORT)
+
+# Pipeline progress and errors are shown in the page
+set_reporter(progress=st.write, error=st.error)
+
 # Streamlit page configuration
 st.set_page_config(page_title="AI-Powered Debate Fact-Checker", page_icon="🎙️", layout="wide")
 st.title("AI-Powered Debate Fact-Checker")
@@ -37,99 +52,105 @@ st.title("AI-Powered Debate Fact-Checker")
 # Initialize session state variables
 if 'transcribed_text' not in st.session_state:
     st.session_state.transcribed_text = ""
+if 'transcript_segments' not in st.session_state:
+    st.session_state.transcript_segments = []
 if 'claims' not in st.session_state:
     st.session_state.claims = []
 if 'fact_checks' not in st.session_state:
     st.session_state.fact_checks = []
-
-async def transcribe_audio(audio_file):
-    try:
-        with sr.AudioFile(audio_file) as source:
-            audio_data = r.record(source)
-        text = r.recognize_google(audio_data)
-        return text
-    except Exception as e:
-        st.error(f"Error transcribing audio: {str(e)}")
-        return ""
-
-async def extract_claims(text):
-    prompt = f"""
-    Given the following transcribed text, extract all clear and concise claims that can be fact-checked.
-    Each claim should be a single sentence and should be something that can be verified.
-    Do not include any additional commentary or notes about the claims.
-    Format the output as a simple numbered list, with each claim on a new line.
-
-    Transcribed text:
-    {text}
-    """
-    
-    try:
-        response = await groq_client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": "You are an AI assistant that extracts clear, concise, and fact-checkable claims from text."},
-                {"role": "user", "content": prompt}
-            ],
-            model="llama-3.1-70b-versatile",
-            temperature=0.1,
-            max_tokens=500,
-            top_p=1,
-        )
-        claims = response.choices[0].message.content.split("\n")
-        return [claim.strip().lstrip("0123456789. ") for claim in claims if claim.strip()]
-    except Exception as e:
-        st.error(f"Error extracting claims: {str(e)}")
-        return []
-
-async def categorize_claim(claim):
-    doc = nlp(claim)
-    categories = [ent.label_ for ent in doc.ents]
-    return list(set(categories))
-
-async def fact_check_claim(claim, web_results, context):
-    categories = await categorize_claim(claim)
-    sentiment = analyze_sentiment(claim)
-    
-    result = await fact_check_with_groq(groq_client, claim, context, web_results, categories, sentiment, None)
-    parsed_result = parse_fact_check_result(result)
-    
-    parsed_result['Categories'] = categories
-    parsed_result['Sentiment'] = sentiment
-    return parsed_result
-
-async def process_claims(claims, context, audio_file):
-    fact_checks = []
-    
-    try:
-        # Process audio for diarization
-        diarization_result = process_audio(audio_file, diarization_pipeline)
-        
-        for i, claim in enumerate(claims):
-            st.write(f"Processing claim {i+1}/{len(claims)}: {claim}")
-            web_results = await web_searcher.search(claim)
-            context = context_builder.get_relevant_context(claim)
-            result = await fact_check_claim(claim, web_results, context)
-            
-            # Assign speaker based on diarization
-            speaker = identify_speaker(diarization_result, i * 10)  # Assuming 10 seconds per claim, adjust as needed
-            
-            context_builder.add_statement(claim, speaker)
-            fact_checks.append((claim, result, speaker))
-    except Exception as e:
-        st.error(f"Error processing claims: {str(e)}")
-        st.error(f"Traceback: {traceback.format_exc()}")
-    return fact_checks
+if 'debate_id' not in st.session_state:
+    st.session_state.debate_id = None
 
 async def main():
+    with st.sidebar:
+        st.subheader("Models")
+        for name, state in models.status().items():
+            if state['loaded']:
+                st.write(f"{name}: loaded in {state['load_time']:.1f}s")
+            else:
+                st.write(f"{name}: {'loading...' if state['loading'] else 'not loaded'}")
+
+        st.subheader("LLM gateway")
+        gateway_metrics = groq_client.metrics()
+        st.write(f"Queue depth: {gateway_metrics['queue_depth']}, in flight: {gateway_metrics['in_flight']}")
+        st.write(f"Requests: {gateway_metrics['requests']}, retries: {gateway_metrics['retries']}, failures: {gateway_metrics['failures']}")
+        if gateway_metrics['latency_p50'] is not None:
+            st.write(f"Latency p50/p95: {gateway_metrics['latency_p50']:.2f}s / {gateway_metrics['latency_p95']:.2f}s")
+
+        show_performance = st.checkbox("Show performance panel")
+
+        st.subheader("Saved debates")
+        saved_debates = results_store.debates()
+        if saved_debates:
+            selected = st.selectbox("Debate", saved_debates, format_func=lambda debate: f"{debate['name']} ({debate['claims']} claims)")
+            if st.button("Load debate"):
+                st.session_state.debate_id = selected['id']
+                st.session_state.fact_checks = results_store.fact_checks(selected['id'])
+                st.session_state.claims = [claim for claim, _, _ in st.session_state.fact_checks]
+                st.session_state.transcribed_text = ""
+                st.session_state.transcript_segments = []
+
     st.header("1. Upload Audio")
-    uploaded_file = st.file_uploader("Choose a WAV file", type="wav")
+    mode = st.radio("Input", ["Upload WAV", "Live microphone"], horizontal=True)
+
+    if mode == "Live microphone":
+        duration = st.slider("Listen for (seconds)", 10, 600, 60)
+        if st.button("Start listening"):
+            session = StreamingSession(groq_client, web_searcher, context_builder)
+            runner = asyncio.ensure_future(session.run(microphone_frames(duration=duration)))
+            live_results = st.container()
+            with st.spinner("Listening and fact-checking..."):
+                # Verdicts are written as soon as each claim is checked
+                while True:
+                    item = await session.results.get()
+                    if item is None:
+                        break
+                    claim, result, speaker = item
+                    live_results.write(f"**{result.get('Verification', 'N/A')}** ({result['Latency']:.1f}s after it was said): {claim}")
+                try:
+                    await runner
+                    capture_error = None
+                except Exception as e:
+                    # Verdicts for what was heard before the failure are still kept
+                    capture_error = MICROPHONE_ERROR.format(str(e))
+            st.session_state.transcribed_text = " ".join(segment["text"] for segment in session.transcript)
+            st.session_state.transcript_segments = session.transcript
+            st.session_state.claims = [claim["text"] for claim in session.claims]
+            st.session_state.fact_checks = session.fact_checks
+            st.session_state.debate_id = results_store.add_debate(
+                f"Live session {time.strftime('%Y-%m-%d %H:%M')}", session.fact_checks, session.claims, source="microphone")
+            if capture_error:
+                st.error(capture_error)
+            else:
+                st.success("Live session complete!")
+
+    uploaded_file = st.file_uploader("Choose a WAV file", type="wav") if mode == "Upload WAV" else None
 
     if uploaded_file is not None:
         st.audio(uploaded_file, format='audio/wav')
         if st.button("Transcribe and Analyze"):
             with st.spinner("Transcribing and analyzing..."):
-                st.session_state.transcribed_text = await transcribe_audio(uploaded_file)
-                st.session_state.claims = await extract_claims(st.session_state.transcribed_text)
-                st.session_state.fact_checks = await process_claims(st.session_state.claims, st.session_state.transcribed_text, uploaded_file)
+                # Verification and confidence are shown as soon as they stream in, before the full explanation
+                status_queue = asyncio.Queue()
+                partial_results = st.container()
+
+                async def show_partial_verdicts():
+                    while True:
+                        claim, field, value = await status_queue.get()
+                        partial_results.write(f"{field} **{value}**: {claim}")
+
+                consumer = asyncio.ensure_future(show_partial_verdicts())
+                try:
+                    # A whole recording's extraction and fact-checks queue behind live sessions' requests
+                    analysis = await analyze_recording(uploaded_file, groq_client.with_priority(BATCH), evidence_searcher, context_builder, status_queue=status_queue)
+                finally:
+                    consumer.cancel()
+                st.session_state.transcribed_text = analysis["transcribed_text"]
+                st.session_state.transcript_segments = analysis["transcript_segments"]
+                st.session_state.claims = analysis["claims"]
+                st.session_state.fact_checks = analysis["fact_checks"]
+                st.session_state.debate_id = results_store.add_debate(
+                    uploaded_file.name, analysis["fact_checks"], analysis["timed_claims"], source="upload")
             st.success("Analysis complete!")
 
     st.header("2. Transcribed Text and Claims")
@@ -137,7 +158,12 @@ async def main():
     st.write("Extracted claims:", st.session_state.claims)
 
     st.header("3. Fact-Check Results")
-    for i, (claim, result, speaker) in enumerate(st.session_state.fact_checks):
+    # Only one page of claims is rendered per rerun, so long debates stay responsive
+    page_size = st.selectbox("Claims per page", [10, 25, 50, 100], index=1)
+    page_count = max(1, -(-len(st.session_state.fact_checks) // page_size))
+    page = st.number_input(f"Page (1-{page_count})", min_value=1, max_value=page_count, value=1) if page_count > 1 else 1
+    first = (page - 1) * page_size
+    for i, (claim, result, speaker) in enumerate(st.session_state.fact_checks[first:first + page_size], start=first):
         with st.expander(f"Claim {i+1}: {claim}", expanded=True):
             verification = result.get("Verification", "N/A")
             confidence = result.get("Confidence", "N/A")
@@ -154,36 +180,51 @@ async def main():
             st.write(f"**Potential Bias:** {bias}")
             st.write(f"**Sources:** {sources}")
             st.write(f"**Categories:** {', '.join(categories)}")
+            if "Check-worthiness" in result:
+                st.write(f"**Check-worthiness:** {result['Check-worthiness']}")
+            if "Duplicate Of" in result:
+                st.write(f"**Verdict shared with:** {result['Duplicate Of']}")
             
-            # Truth meter visualization
-            fig = go.Figure(go.Indicator(
-                mode = "gauge+number",
-                value = sentiment_to_percentage(sentiment),
-                title = {'text': "Truth Meter"},
-                gauge = {'axis': {'range': [0, 100]},
-                         'bar': {'color': "darkblue"},
-                         'steps' : [
-                             {'range': [0, 33], 'color': "lightgray"},
-                             {'range': [33, 66], 'color': "gray"},
-                             {'range': [66, 100], 'color': "darkgray"}],
-                         'threshold': {
-                             'line': {'color': "red", 'width': 4},
-                             'thickness': 0.75,
-                             'value': 50}}))
-            st.plotly_chart(fig)
+            # Truth meter visualization; gauges are cached by value, so reruns reuse them
+            st.plotly_chart(create_truth_meter(sentiment))
 
     # Overall statistics
     st.header("4. Overall Statistics")
-    verified_count, partially_verified_count, not_verified_count = get_verification_counts(st.session_state.fact_checks)
+    if st.session_state.debate_id is not None:
+        counts = results_store.verification_counts(st.session_state.debate_id)
+        verified_count, partially_verified_count, not_verified_count = counts["VERIFIED"], counts["PARTIALLY VERIFIED"], counts["NOT VERIFIED"]
+    else:
+        verified_count, partially_verified_count, not_verified_count = get_verification_counts(st.session_state.fact_checks)
     
-    fig = go.Figure(data=[go.Pie(labels=['Verified', 'Partially Verified', 'Not Verified'], 
-                                 values=[verified_count, partially_verified_count, not_verified_count])])
-    st.plotly_chart(fig)
+    st.plotly_chart(create_verification_pie(verified_count, partially_verified_count, not_verified_count))
+    st.plotly_chart(create_network_graph(st.session_state.fact_checks))
+
+    if len(saved_debates) > 1:
+        st.subheader(f"Across all {len(saved_debates)} saved debates")
+        st.dataframe(pd.DataFrame.from_dict(results_store.counts_by_speaker(), orient="index"))
+        top_categories = results_store.counts_by_category(limit=10)
+        if top_categories:
+            st.bar_chart(pd.Series(top_categories, name="claims"))
 
     # Display current topics
     st.header("5. Current Topics")
     current_topics = context_builder.get_current_topics()
     st.write("Current topics:", ", ".join(current_topics))
 
+    if show_performance:
+        st.header("6. Performance")
+        trace = tracer.summary()
+        stages = pd.DataFrame.from_dict(trace["stages"], orient="index")
+        if not stages.empty:
+            st.subheader("Time per stage (seconds)")
+            st.dataframe(stages.sort_values("total", ascending=False))
+        claim_timings = pd.DataFrame.from_dict(tracer.claim_timings(), orient="index")
+        if not claim_timings.empty:
+            st.subheader("Time per claim (seconds)")
+            st.dataframe(claim_timings.fillna(0.0))
+        if trace["counters"]:
+            st.subheader("Counters")
+            st.json(trace["counters"])
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,80 @@
+import threading
+import time
+from utils import SPACY_MODEL, DIARIZATION_MODEL, HUGGINGFACE_TOKEN, UNEXPECTED_ERROR
+
+class ModelRegistry:
+    """Process-wide registry that loads each model on first use and shares it afterwards.
+
+    Streamlit re-executes main.py on every interaction but keeps imported modules,
+    so models held here survive reruns and are shared by every session.
+    """
+
+    def __init__(self):
+        self.loaders = {}
+        self.models = {}
+        self.load_times = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+        self.warm_up_threads = {}
+
+    def register(self, name, loader):
+        with self.lock:
+            self.loaders[name] = loader
+            self.locks.setdefault(name, threading.Lock())
+
+    def get(self, name):
+        if name in self.models:
+            return self.models[name]
+        if name not in self.loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        # One lock per model: concurrent callers wait for a single load
+        with self.locks[name]:
+            if name not in self.models:
+                start = time.perf_counter()
+                self.models[name] = self.loaders[name]()
+                self.load_times[name] = time.perf_counter() - start
+        return self.models[name]
+
+    def is_loaded(self, name):
+        return name in self.models
+
+    def warm_up(self, names=None):
+        """Start loading models on daemon threads; safe to call on every rerun"""
+        with self.lock:
+            for name in names or list(self.loaders):
+                thread = self.warm_up_threads.get(name)
+                if name in self.models or (thread is not None and thread.is_alive()):
+                    continue
+                thread = threading.Thread(target=self._warm_up, args=(name,), name=f"warm-up-{name}", daemon=True)
+                self.warm_up_threads[name] = thread
+                thread.start()
+
+    def _warm_up(self, name):
+        try:
+            self.get(name)
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+
+    def status(self):
+        """Load state and load time in seconds for every registered model"""
+        return {
+            name: {
+                "loaded": name in self.models,
+                "loading": name not in self.models and name in self.warm_up_threads and self.warm_up_threads[name].is_alive(),
+                "load_time": self.load_times.get(name),
+            }
+            for name in self.loaders
+        }
+
+def _load_spacy():
+    import spacy
+    return spacy.load(SPACY_MODEL)
+
+def _load_diarization():
+    from pyannote.audio import Pipeline
+    return Pipeline.from_pretrained(DIARIZATION_MODEL, use_auth_token=HUGGINGFACE_TOKEN)
+
+models = ModelRegistry()
+models.register("spacy", _load_spacy)
+models.register("diarization", _load_diarization)
@@ -0,0 +1,303 @@
+import asyncio
+import re
+import traceback
+from disk_cache import normalize_text
+from fact_checking import fact_check_with_groq, fact_check_batch_with_groq, parse_fact_check_result
+from tracing import tracer
+from utils import TRACE_FILE, LLM_MODEL, CLAIM_CHUNK_CHARS, CLAIM_CHUNK_OVERLAP, FACT_CHECK_CONCURRENCY, BATCH_FACT_CHECKS, TRANSCRIPTION_ERROR, CLAIM_EXTRACTION_ERROR, report_progress, report_error, split_sentences
+from audio_processing import analyze_sentiment, SpeakerIndex, align_claims
+from transcription import transcribe_segments, join_segments
+from model_registry import models
+from enrichment import enrich_claims
+from triage import triage_claims, select_claims, not_checkable, report_savings
+from diarization import diarize
+from ingestion import load_audio
+from dedup import cluster_claims, fan_out
+
+async def transcribe_audio(audio_file):
+    try:
+        with tracer.span("transcription") as span:
+            segments = await transcribe_segments(audio_file)
+            span.update(segments=len(segments), audio_seconds=segments[-1]["end"] if segments else 0.0)
+        return join_segments(segments), segments
+    except Exception as e:
+        report_error(TRANSCRIPTION_ERROR.format(str(e)))
+        return "", []
+
+def _split_long(text, start, max_chars):
+    # Unpunctuated transcripts come back as one "sentence"; fall back to word boundaries
+    pieces = []
+    piece_start = start
+    for match in re.finditer(r"\S+", text):
+        if start + match.end() - piece_start > max_chars and start + match.start() > piece_start:
+            pieces.append((piece_start, start + match.start()))
+            piece_start = start + match.start()
+    pieces.append((piece_start, start + len(text.rstrip())))
+    return pieces
+
+def chunk_transcript(text, max_chars=CLAIM_CHUNK_CHARS, overlap_sentences=CLAIM_CHUNK_OVERLAP):
+    """Split a transcript into sentence-aligned chunks that share `overlap_sentences` sentences.
+
+    Returns (start, end) character offsets into `text`.
+    """
+    spans = []
+    position = 0
+    for sentence in split_sentences(text):
+        start = text.find(sentence, position)
+        if start == -1:
+            start = position
+        end = start + len(sentence)
+        position = end
+        spans.extend(_split_long(text[start:end], start, max_chars) if end - start > max_chars else [(start, end)])
+
+    chunks = []
+    first = 0
+    while first < len(spans):
+        last = first
+        while last + 1 < len(spans) and spans[last + 1][1] - spans[first][0] <= max_chars:
+            last += 1
+        chunks.append((spans[first][0], spans[last][1]))
+        if last + 1 >= len(spans):
+            break
+        first = max(first + 1, last + 1 - overlap_sentences)
+    return chunks
+
+async def extract_chunk_claims(groq_client, text, errors=None):
+    prompt = f"""
+    Given the following transcribed text, extract all clear and concise claims that can be fact-checked.
+    Each claim should be a single sentence and should be something that can be verified.
+    Do not include any additional commentary or notes about the claims.
+    Format the output as a simple numbered list, with each claim on a new line.
+
+    Transcribed text:
+    {text}
+    """
+    
+    try:
+        response = await groq_client.chat.completions.create(
+            messages=[
+                {"role": "system", "content": "You are an AI assistant that extracts clear, concise, and fact-checkable claims from text."},
+                {"role": "user", "content": prompt}
+            ],
+            model=LLM_MODEL,
+            temperature=0.1,
+            max_tokens=500,
+            top_p=1,
+        )
+        claims = response.choices[0].message.content.split("\n")
+        return [claim.strip().lstrip("0123456789. ") for claim in claims if claim.strip()]
+    except Exception as e:
+        report_error(CLAIM_EXTRACTION_ERROR.format(str(e)))
+        if errors is not None:
+            errors.append(CLAIM_EXTRACTION_ERROR.format(str(e)))
+        return []
+
+async def extract_claims(groq_client, text, errors=None):
+    """Extract claims chunk by chunk in parallel, then merge and de-duplicate them.
+
+    Returns {"text", "chunk_start", "chunk_end"} dicts; the offsets locate the
+    chunk each claim came from within `text`. Failures are reported and, when
+    `errors` is a list, appended to it, so callers can tell them from a
+    transcript without claims.
+    """
+    if not text.strip():
+        return []
+    try:
+        chunks = chunk_transcript(text)
+        with tracer.span("claim_extraction", chunks=len(chunks)) as span:
+            results = await asyncio.gather(*(extract_chunk_claims(groq_client, text[start:end], errors) for start, end in chunks))
+            span["claims"] = sum(map(len, results))
+    except Exception as e:
+        report_error(CLAIM_EXTRACTION_ERROR.format(str(e)))
+        if errors is not None:
+            errors.append(CLAIM_EXTRACTION_ERROR.format(str(e)))
+        return []
+
+    claims = []
+    seen = set()
+    for (start, end), chunk_claims in zip(chunks, results):
+        for claim in chunk_claims:
+            # Claims from the overlap between chunks usually come back twice
+            key = re.sub(r"[^\w\s]", "", normalize_text(claim))
+            if key and key not in seen:
+                seen.add(key)
+                claims.append({"text": claim, "chunk_start": start, "chunk_end": end})
+    return claims
+
+async def categorize_claim(claim):
+    doc = models.get("spacy")(claim)
+    categories = [ent.label_ for ent in doc.ents]
+    return list(set(categories))
+
+async def fact_check_claim(groq_client, claim, web_results, context, enrichment=None, status_queue=None):
+    if enrichment is None:
+        categories = await categorize_claim(claim)
+        sentiment = analyze_sentiment(claim)
+    else:
+        categories, sentiment = enrichment['categories'], enrichment['sentiment']
+    
+    result = await fact_check_with_groq(groq_client, claim, context, web_results, categories, sentiment, status_queue)
+    with tracer.span("parse", claim=claim):
+        parsed_result = parse_fact_check_result(result)
+    
+    parsed_result['Categories'] = categories
+    parsed_result['Sentiment'] = sentiment
+    return parsed_result
+
+async def fact_check_claims(groq_client, claims, web_results_list, contexts, enrichments):
+    items = []
+    for claim, web_results, context, enrichment in zip(claims, web_results_list, contexts, enrichments):
+        items.append({
+            'statement': claim,
+            'context': context,
+            'web_results': web_results,
+            'categories': enrichment['categories'],
+            'sentiment': enrichment['sentiment'],
+        })
+
+    results = await fact_check_batch_with_groq(groq_client, items)
+
+    parsed_results = []
+    for item, result in zip(items, results):
+        parsed_result = parse_fact_check_result(result)
+        parsed_result['Categories'] = item['categories']
+        parsed_result['Sentiment'] = item['sentiment']
+        parsed_results.append(parsed_result)
+    return parsed_results
+
+async def process_claims(claims, context, diarization, groq_client, web_searcher, context_builder, concurrency=FACT_CHECK_CONCURRENCY, batch=BATCH_FACT_CHECKS, status_queue=None, errors=None):
+    """(claim, result, speaker) for every claim; on failure the error is reported, appended to `errors` if given, and [] returned"""
+    fact_checks = []
+    
+    try:
+        # Claims arrive as {"text", "start", "end"} dicts from align_claims; plain strings have no timing
+        claims = [claim if isinstance(claim, dict) else {"text": claim, "start": None, "end": None} for claim in claims]
+        spans = [(claim["start"], claim["end"]) for claim in claims]
+        claims = [claim["text"] for claim in claims]
+
+        # Repeated talking points are only searched and checked once per cluster
+        loop = asyncio.get_running_loop()
+        representatives = await loop.run_in_executor(None, cluster_claims, claims)
+        unique = sorted(set(representatives))
+        saved = len(claims) - len(unique)
+        if saved:
+            report_progress(f"Skipping {saved} near-duplicate claims: {saved} searches and {saved} fact-check calls saved")
+
+        # Only check-worthy claims go on to search and the LLM, most check-worthy first
+        triaged = dict(zip(unique, await triage_claims([claims[i] for i in unique])))
+        ordered = [unique[n] for n in select_claims([triaged[i]["score"] for i in unique])]
+        skipped = len(unique) - len(ordered)
+        if skipped:
+            report_progress(report_savings(skipped, len(unique)))
+
+        # Start every web search up front so they run ahead of the fact-checks, and
+        # enrich the claim list in one pass off the event loop, reusing triage's entities
+        search_tasks = {i: asyncio.ensure_future(web_searcher.search(claims[i])) for i in ordered}
+        enrichment_task = asyncio.ensure_future(enrich_claims([claims[i] for i in unique], categories=[triaged[i]["categories"] for i in unique]))
+        position = {i: n for n, i in enumerate(unique)}
+
+        # Diarization runs in a worker process alongside transcription and claim extraction
+        if asyncio.isfuture(diarization) or asyncio.iscoroutine(diarization):
+            diarization = await diarization
+        speaker_index = SpeakerIndex.from_diarization(diarization)
+        speakers = [speaker_index.lookup(start, end) if start is not None else "Unknown" for start, end in spans]
+
+        # Index every claim, then score them all in one pass; each claim can
+        # only match statements that were said before it
+        indexed = len(context_builder.statements)
+        for claim, speaker in zip(claims, speakers):
+            context_builder.add_statement(claim, speaker)
+        with tracer.span("context", claims=len(claims)):
+            contexts = context_builder.get_relevant_contexts(claims, limits=[indexed + i for i in range(len(claims))])
+
+        if batch:
+            # Pack claims into as few Groq requests as the token budget allows
+            report_progress(f"Fact-checking {len(ordered)} claims in batches")
+            web_results_list = await asyncio.gather(*(search_tasks[i] for i in ordered))
+            enrichments = await enrichment_task
+            checked = await fact_check_claims(groq_client, [claims[i] for i in ordered], web_results_list, [contexts[i] for i in ordered], [enrichments[position[i]] for i in ordered])
+        else:
+            semaphore = asyncio.Semaphore(max(1, concurrency))
+
+            async def check(n, i):
+                web_results = await search_tasks[i]
+                enrichments = await asyncio.shield(enrichment_task)
+                async with semaphore:
+                    report_progress(f"Processing claim {n+1}/{len(ordered)}: {claims[i]}")
+                    return await fact_check_claim(groq_client, claims[i], web_results, contexts[i], enrichments[position[i]], status_queue)
+
+            try:
+                checked = await asyncio.gather(*(check(n, i) for n, i in enumerate(ordered)))
+            finally:
+                for task in search_tasks.values():
+                    task.cancel()
+
+        verdicts = dict(zip(ordered, checked))
+        enrichments = await enrichment_task
+        for i in unique:
+            if i not in verdicts:
+                verdicts[i] = not_checkable(triaged[i])
+                verdicts[i]['Categories'] = enrichments[position[i]]['categories']
+                verdicts[i]['Sentiment'] = enrichments[position[i]]['sentiment']
+            verdicts[i]['Check-worthiness'] = round(triaged[i]["score"], 2)
+
+        # Results are written back in the original claim order, duplicates included
+        results = fan_out(claims, representatives, verdicts)
+        fact_checks = list(zip(claims, results, speakers))
+    except Exception as e:
+        report_error(f"Error processing claims: {str(e)}")
+        report_error(f"Traceback: {traceback.format_exc()}")
+        if errors is not None:
+            errors.append(f"Error processing claims: {str(e)}")
+    return fact_checks
+
+def analysis_error(text, fact_checks, errors=()):
+    """Why an analysis produced nothing usable, or None when it succeeded"""
+    if not text.strip():
+        return "No speech was transcribed"
+    if errors:
+        more = f" (and {len(errors) - 1} more errors)" if len(errors) > 1 else ""
+        return errors[0] + more
+    verdicts = [result.get("Verification") for _, result, _ in fact_checks]
+    if verdicts and all(verdict == "ERROR" for verdict in verdicts):
+        return f"All {len(verdicts)} fact-checks failed"
+    return None
+
+async def analyze_recording(audio_file, groq_client, web_searcher, context_builder, concurrency=FACT_CHECK_CONCURRENCY, batch=BATCH_FACT_CHECKS, diarization_executor=None, status_queue=None):
+    """Run the whole pipeline on one recording: transcribe, extract claims and fact-check them.
+
+    When `status_queue` is given, (claim, field, value) tuples are put on it as
+    verdict fields arrive from the streamed Groq responses. The result's "error"
+    is None, or a message when the recording could not be analyzed: nothing was
+    transcribed, claim extraction or claim processing failed, or every
+    fact-check failed.
+    """
+    # The recording is written to disk once; transcription and diarization
+    # share memory-mapped views of it and skip the silence found by the VAD
+    try:
+        audio = await load_audio(audio_file)
+    except Exception as e:
+        report_error(TRANSCRIPTION_ERROR.format(str(e)))
+        return {"transcribed_text": "", "transcript_segments": [], "claims": [], "timed_claims": [], "fact_checks": [],
+                "error": TRANSCRIPTION_ERROR.format(str(e))}
+
+    # Diarization runs alongside transcription and claim extraction
+    diarization_task = asyncio.ensure_future(diarize(audio, executor=diarization_executor))
+    errors = []
+    try:
+        text, segments = await transcribe_audio(audio)
+        claims = await extract_claims(groq_client, text, errors)
+        timed_claims = align_claims(claims, segments)
+        fact_checks = await process_claims(timed_claims, text, diarization_task, groq_client, web_searcher, context_builder, concurrency, batch, status_queue, errors)
+    finally:
+        diarization_task.cancel()
+    if TRACE_FILE:
+        tracer.export_json(TRACE_FILE)
+    return {
+        "transcribed_text": text,
+        "transcript_segments": segments,
+        "claims": [claim["text"] for claim in claims],
+        "timed_claims": timed_claims,
+        "fact_checks": fact_checks,
+        "error": analysis_error(text, fact_checks, errors),
+    }
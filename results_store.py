@@ -0,0 +1,207 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from utils import RESULTS_DB, UNEXPECTED_ERROR
+
+VERDICTS = ("VERIFIED", "PARTIALLY VERIFIED", "NOT VERIFIED")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS debates (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    source TEXT,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claims (
+    id INTEGER PRIMARY KEY,
+    debate_id INTEGER NOT NULL REFERENCES debates (id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    claim TEXT NOT NULL,
+    speaker TEXT,
+    verification TEXT,
+    confidence TEXT,
+    sentiment REAL,
+    start_time REAL,
+    end_time REAL,
+    duplicate_of TEXT,
+    result TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS claim_categories (
+    claim_id INTEGER NOT NULL REFERENCES claims (id) ON DELETE CASCADE,
+    category TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS claims_debate ON claims (debate_id, position);
+CREATE INDEX IF NOT EXISTS claims_debate_verification ON claims (debate_id, verification);
+CREATE INDEX IF NOT EXISTS claims_speaker_verification ON claims (speaker, verification);
+CREATE INDEX IF NOT EXISTS claims_verification ON claims (verification);
+CREATE INDEX IF NOT EXISTS claim_categories_category ON claim_categories (category, claim_id);
+CREATE INDEX IF NOT EXISTS claim_categories_claim ON claim_categories (claim_id);
+"""
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+class ResultsStore:
+    """Fact-check results of every analyzed debate, kept in SQLite.
+
+    Claims are stored one row each, with their categories in a side table, so
+    counts and filters by debate, speaker, verdict or category run as indexed
+    queries in the database instead of scans over Python lists.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA foreign_keys=ON")
+        self.connection.execute("PRAGMA busy_timeout=5000")
+        self.connection.executescript(SCHEMA)
+
+    def add_debate(self, name, fact_checks, timed_claims=None, source=None, replace=False):
+        """Store a debate and its (claim, result, speaker) tuples in one transaction; returns the debate id.
+
+        With `replace`, debates already stored from the same `source` are deleted
+        in that transaction, so saving a recording again never duplicates it.
+        """
+        timed_claims = timed_claims or []
+        with self.lock:
+            cursor = self.connection.cursor()
+            cursor.execute("BEGIN")
+            try:
+                if replace and source is not None:
+                    cursor.execute("DELETE FROM debates WHERE source = ?", (source,))
+                cursor.execute("INSERT INTO debates (name, source, created) VALUES (?, ?, ?)", (name, source, time.time()))
+                debate_id = cursor.lastrowid
+                rows = []
+                for position, (claim, result, speaker) in enumerate(fact_checks):
+                    timing = timed_claims[position] if position < len(timed_claims) else {}
+                    rows.append((debate_id, position, claim, speaker, result.get("Verification"), result.get("Confidence"),
+                                 _as_float(result.get("Sentiment")), timing.get("start"), timing.get("end"),
+                                 result.get("Duplicate Of"), json.dumps(result, ensure_ascii=False, default=str)))
+                cursor.executemany(
+                    "INSERT INTO claims (debate_id, position, claim, speaker, verification, confidence, sentiment, start_time, end_time, duplicate_of, result) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                claim_ids = dict(cursor.execute("SELECT position, id FROM claims WHERE debate_id = ?", (debate_id,)).fetchall())
+                categories = [
+                    (claim_ids[position], category)
+                    for position, (_, result, _) in enumerate(fact_checks)
+                    if isinstance(result.get("Categories"), list)
+                    for category in set(result["Categories"])
+                ]
+                cursor.executemany("INSERT INTO claim_categories (claim_id, category) VALUES (?, ?)", categories)
+                cursor.execute("COMMIT")
+                return debate_id
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+
+    def debates(self):
+        """Every stored debate with its claim count, newest first"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT d.id, d.name, d.source, d.created, COUNT(c.id) FROM debates d "
+                "LEFT JOIN claims c ON c.debate_id = d.id GROUP BY d.id ORDER BY d.created DESC"
+            ).fetchall()
+        return [dict(zip(("id", "name", "source", "created", "claims"), row)) for row in rows]
+
+    def fact_checks(self, debate_id):
+        """A debate's results as (claim, result, speaker) tuples, in claim order"""
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT claim, result, speaker FROM claims WHERE debate_id = ? ORDER BY position", (debate_id,)
+            ).fetchall()
+        return [(claim, json.loads(result), speaker) for claim, result, speaker in rows]
+
+    def _where(self, debate_id=None, speaker=None, verification=None, category=None):
+        clauses = []
+        params = []
+        if debate_id is not None:
+            clauses.append("c.debate_id = ?")
+            params.append(debate_id)
+        if speaker is not None:
+            clauses.append("c.speaker = ?")
+            params.append(speaker)
+        if verification is not None:
+            clauses.append("c.verification = ?")
+            params.append(verification)
+        if category is not None:
+            clauses.append("c.id IN (SELECT claim_id FROM claim_categories WHERE category = ?)")
+            params.append(category)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def verification_counts(self, debate_id=None, speaker=None, category=None):
+        """Claims per verdict, for one debate or all of them"""
+        where, params = self._where(debate_id, speaker, category=category)
+        with self.lock:
+            rows = self.connection.execute(f"SELECT c.verification, COUNT(*) FROM claims c{where} GROUP BY c.verification", params).fetchall()
+        counts = dict.fromkeys(VERDICTS, 0)
+        counts.update(rows)
+        return counts
+
+    def counts_by_speaker(self, debate_id=None):
+        """{speaker: {verdict: count}}"""
+        where, params = self._where(debate_id)
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT c.speaker, c.verification, COUNT(*) FROM claims c{where} GROUP BY c.speaker, c.verification", params
+            ).fetchall()
+        counts = {}
+        for speaker, verification, count in rows:
+            counts.setdefault(speaker, dict.fromkeys(VERDICTS, 0))[verification] = count
+        return counts
+
+    def counts_by_category(self, debate_id=None, limit=None):
+        """Claims per category, most frequent first"""
+        where, params = self._where(debate_id)
+        # Without a filter the category index alone answers the query
+        source = f"claim_categories cc JOIN claims c ON c.id = cc.claim_id{where}" if where else "claim_categories cc"
+        query = f"SELECT cc.category, COUNT(*) AS n FROM {source} GROUP BY cc.category ORDER BY n DESC, cc.category"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return dict(self.connection.execute(query, params).fetchall())
+
+    def claims(self, debate_id=None, speaker=None, verification=None, category=None, limit=None, offset=0):
+        """Matching claims as (claim, result, speaker) tuples, in debate and claim order"""
+        where, params = self._where(debate_id, speaker, verification, category)
+        query = f"SELECT c.claim, c.result, c.speaker FROM claims c{where} ORDER BY c.debate_id, c.position"
+        if limit is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        with self.lock:
+            rows = self.connection.execute(query, params).fetchall()
+        return [(claim, json.loads(result), speaker) for claim, result, speaker in rows]
+
+    def delete_debate(self, debate_id):
+        try:
+            with self.lock:
+                self.connection.execute("DELETE FROM debates WHERE id = ?", (debate_id,))
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_results_store():
+    """The process-wide store, so Streamlit reruns reuse one connection instead of opening a new one each time"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ResultsStore()
+    return _store
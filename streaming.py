@@ -0,0 +1,271 @@
+"""Live fact-checking from a microphone or a raw PCM socket.
+
+Audio frames are transcribed in rolling windows as they arrive. Claims are
+extracted from each completed sentence right away, their context is taken
+from what was said before it, and the sentence is then added to the
+EnhancedContextBuilder. Every claim is fact-checked as soon as it is found.
+Verdicts are pushed to `StreamingSession.results` as they complete.
+
+Run headless against a socket (16 kHz, 16-bit mono little-endian PCM):
+
+    python streaming.py --port 5050
+"""
+import argparse
+import asyncio
+import logging
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from transcription import get_backend, drop_overlap, recognize_chunk
+from disk_cache import normalize_text
+from fact_checking import error_result
+from pipeline import extract_claims, fact_check_claim
+from triage import triage_claims, select_claims, report_savings
+from tracing import tracer
+from utils import STREAM_SAMPLE_RATE, STREAM_WINDOW, STREAM_HOP, STREAM_MAX_SENTENCE_WORDS, FACT_CHECK_CONCURRENCY, UNEXPECTED_ERROR, report_error, report_progress, split_sentences
+
+logger = logging.getLogger(__name__)
+
+class StreamingSession:
+    def __init__(self, groq_client, web_searcher, context_builder, sample_rate=STREAM_SAMPLE_RATE,
+                 window=STREAM_WINDOW, hop=STREAM_HOP, backend=None, concurrency=FACT_CHECK_CONCURRENCY):
+        self.groq_client = groq_client
+        self.web_searcher = web_searcher
+        self.context_builder = context_builder
+        self.sample_rate = sample_rate
+        self.window = int(window * sample_rate)
+        self.hop = int(hop * sample_rate)
+        self.backend = backend or get_backend()
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.executor = ThreadPoolExecutor(max_workers=2)
+
+        self.buffer = np.zeros(0, dtype=np.int16)
+        self.buffer_offset = 0  # Absolute sample index of buffer[0]
+        self.remainder = b""  # Odd trailing byte of the last block, completed by the next one
+        self.received = 0
+        self.transcribed_until = 0
+        self.frame_times = []  # (absolute sample index, wall-clock arrival) per fed block
+        self.previous = {"text": ""}
+        self.pending_text = ""
+        self.pending_start = 0.0
+
+        self.transcript = []
+        self.claims = []
+        self.fact_checks = []
+        self.seen_claims = set()  # Normalised claim text, so a repeat heard across windows is checked once
+        self.results = asyncio.Queue()
+        self.tasks = set()
+        self.transcribe_lock = asyncio.Lock()
+
+    def feed(self, frames):
+        """Append raw 16-bit mono PCM and schedule transcription once a hop of new audio is buffered"""
+        # Socket reads can split a sample across blocks
+        frames = self.remainder + bytes(frames)
+        usable = len(frames) & ~1
+        self.remainder = frames[usable:]
+        samples = np.frombuffer(frames[:usable], dtype="<i2")
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.received += len(samples)
+        self.frame_times.append((self.received, time.monotonic()))
+        if self.received - self.transcribed_until >= self.hop:
+            self.transcribed_until = self.received
+            self._spawn(self._transcribe_window(self.received))
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _arrival_time(self, sample_index):
+        for received, arrived in self.frame_times:
+            if received >= sample_index:
+                return arrived
+        return time.monotonic()
+
+    async def _transcribe_window(self, end):
+        # Windows are transcribed one at a time, in order, so stitching sees them in sequence
+        async with self.transcribe_lock:
+            # Each window re-reads the tail of the previous one; drop_overlap removes the repeated words
+            start = max(self.buffer_offset, end - self.window)
+            chunk = self.buffer[start - self.buffer_offset:end - self.buffer_offset]
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(self.executor, recognize_chunk, self.backend, chunk, self.sample_rate)
+
+            segment = {"start": start / self.sample_rate, "end": end / self.sample_rate, "text": drop_overlap(self.previous["text"], text.strip())}
+            if segment["text"]:
+                self.previous = {"text": text.strip()}
+                self.transcript.append(segment)
+                if not self.pending_text:
+                    self.pending_start = segment["start"]
+                self.pending_text = f"{self.pending_text} {segment['text']}".strip()
+                self._emit_sentences(end)
+
+            # Audio older than one window is never read again
+            drop = max(0, end - self.window - self.buffer_offset)
+            if drop:
+                self.buffer = self.buffer[drop:]
+                self.buffer_offset += drop
+                self.frame_times = [item for item in self.frame_times if item[0] >= self.buffer_offset]
+
+    def _emit_sentences(self, end, final=False):
+        sentences = split_sentences(self.pending_text)
+        # The last sentence may still be in progress unless the stream has ended.
+        # Recognizers often omit punctuation, so an overlong run also counts as complete.
+        final = final or (len(sentences) == 1 and len(self.pending_text.split()) >= STREAM_MAX_SENTENCE_WORDS)
+        complete = sentences if final else sentences[:-1]
+        if not complete:
+            return
+        self.pending_text = "" if final else sentences[-1]
+        span = (self.pending_start, end / self.sample_rate)
+        self.pending_start = span[1]
+        heard_at = self._arrival_time(end)
+        self._spawn(self._check_sentences(complete, span, heard_at))
+
+    async def _check_sentences(self, sentences, span, heard_at):
+        extracted = await extract_claims(self.groq_client, " ".join(sentences))
+        claims = []
+        for claim in extracted:
+            key = re.sub(r"[^\w\s]", "", normalize_text(claim["text"]))
+            if key and key not in self.seen_claims:
+                self.seen_claims.add(key)
+                claims.append(claim["text"])
+        # Opinions and fragments are dropped here, so live verdicts wait on fewer searches
+        triaged = await triage_claims(claims)
+        selected = select_claims([item["score"] for item in triaged])
+        if len(selected) < len(claims):
+            report_progress(report_savings(len(claims) - len(selected), len(claims)))
+        # Contexts are taken before these sentences are indexed, so a claim is never its own context
+        contexts = {n: self.context_builder.get_relevant_context(claims[n]) for n in selected}
+        for sentence in sentences:
+            self.context_builder.add_statement(sentence, "Unknown")
+        await asyncio.gather(*(self._check_claim(claims[n], contexts[n], span, heard_at) for n in selected))
+
+    async def _check_claim(self, claim, context, span, heard_at):
+        try:
+            web_results = await self.web_searcher.search(claim)
+            async with self.semaphore:
+                result = await fact_check_claim(self.groq_client, claim, web_results, context)
+        except Exception as e:
+            report_error(UNEXPECTED_ERROR.format(str(e)))
+            result = error_result(UNEXPECTED_ERROR.format(str(e)))
+        result["Latency"] = time.monotonic() - heard_at
+        tracer.record("heard_to_verdict", result["Latency"], claim=claim)
+        # Appended together, with no await in between, so claims[i] is always the timing of fact_checks[i]
+        self.claims.append({"text": claim, "start": span[0], "end": span[1]})
+        self.fact_checks.append((claim, result, "Unknown"))
+        await self.results.put((claim, result, "Unknown"))
+
+    async def finish(self):
+        """Transcribe any remaining audio, flush the last sentence and wait for every verdict"""
+        if self.received > self.transcribed_until:
+            await self._transcribe_window(self.received)
+        while self.tasks:
+            await asyncio.gather(*list(self.tasks))
+        if self.pending_text:
+            self._emit_sentences(self.received, final=True)
+            while self.tasks:
+                await asyncio.gather(*list(self.tasks))
+        self.executor.shutdown(wait=False)
+        await self.results.put(None)
+
+    async def run(self, frames):
+        """Feed every block from an async iterator of PCM frames, then finish.
+
+        The session finishes even when the frames fail, so `results` always gets
+        its end marker; the capture error is then re-raised to the caller.
+        """
+        try:
+            async for block in frames:
+                self.feed(block)
+        finally:
+            await self.finish()
+
+async def microphone_frames(sample_rate=STREAM_SAMPLE_RATE, block=0.5, duration=None):
+    """Yield PCM blocks from the default microphone (requires PyAudio)"""
+    import speech_recognition as sr
+
+    queue = asyncio.Queue()
+    loop = asyncio.get_running_loop()
+    stop = False
+
+    def capture():
+        try:
+            with sr.Microphone(sample_rate=sample_rate, chunk_size=1024) as source:
+                frames_per_block = int(block * sample_rate / source.CHUNK)
+                started = time.monotonic()
+                while not stop and (duration is None or time.monotonic() - started < duration):
+                    data = b"".join(source.stream.read(source.CHUNK) for _ in range(max(1, frames_per_block)))
+                    loop.call_soon_threadsafe(queue.put_nowait, data)
+        finally:
+            # Queued even when the microphone cannot be opened; the error surfaces from capture_future
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    capture_future = loop.run_in_executor(None, capture)
+    try:
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            yield data
+    finally:
+        stop = True
+        await capture_future
+
+async def socket_frames(host="127.0.0.1", port=5050, block_bytes=16000):
+    """Yield PCM blocks from the first client that connects to host:port"""
+    connected = asyncio.Future()
+
+    async def handle(reader, writer):
+        if not connected.done():
+            connected.set_result((reader, writer))
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info(f"Waiting for PCM audio on {host}:{port}")
+    try:
+        reader, writer = await connected
+        while True:
+            data = await reader.read(block_bytes)
+            if not data:
+                break
+            yield data
+        writer.close()
+    finally:
+        server.close()
+
+async def _serve(args):
+    from groq import AsyncGroq
+    from context_builder import EnhancedContextBuilder
+    from llm_gateway import LLMGateway
+    from tracing import serve_metrics
+    from utils import GROQ_API_KEY, GROQ_BASE_URL, METRICS_PORT
+    from web_search import EfficientWebSearch
+
+    if METRICS_PORT:
+        serve_metrics(METRICS_PORT)
+    async with EfficientWebSearch() as web_searcher:
+        groq_client = LLMGateway(AsyncGroq(api_key=GROQ_API_KEY, base_url=GROQ_BASE_URL, max_retries=0))
+        session = StreamingSession(groq_client, web_searcher, EnhancedContextBuilder())
+        frames = microphone_frames(duration=args.duration) if args.microphone else socket_frames(args.host, args.port)
+        runner = asyncio.ensure_future(session.run(frames))
+        while True:
+            item = await session.results.get()
+            if item is None:
+                break
+            claim, result, _ = item
+            print(f"[{result['Latency']:.1f}s] {result.get('Verification', 'N/A')}: {claim}")
+        await runner
+
+def main():
+    parser = argparse.ArgumentParser(description="Live fact-checking from a microphone or PCM socket.")
+    parser.add_argument("--microphone", action="store_true", help="capture from the default microphone")
+    parser.add_argument("--duration", type=float, help="stop microphone capture after this many seconds")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5050)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_serve(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import random
+from collections import defaultdict
+from audio_processing import SpeakerIndex
+
+def _brute_force(tracks, start, end):
+    overlap = defaultdict(float)
+    for track_start, track_end, speaker in tracks:
+        overlap[speaker] += max(0.0, min(end, track_end) - max(start, track_start))
+    return overlap
+
+def test_lookup_picks_the_speaker_with_most_overlap():
+    rng = random.Random(0)
+    tracks = []
+    for speaker in ("A", "B", "C"):
+        position = rng.uniform(0, 5)
+        for _ in range(20):
+            duration = rng.uniform(0.1, 20)
+            tracks.append((position, position + duration, speaker))
+            position += duration + rng.uniform(0, 5)
+    index = SpeakerIndex(tracks)
+    for _ in range(500):
+        start = rng.uniform(0, 200)
+        end = start + rng.uniform(0.01, 10)
+        overlap = _brute_force(tracks, start, end)
+        best = max(overlap.values(), default=0.0)
+        found = index.lookup(start, end)
+        assert found == "Unknown" if best <= 0 else abs(overlap[found] - best) < 1e-9
+
+def test_lookup_with_a_long_turn():
+    # A speaker holding the floor throughout must not make lookups scan every other turn
+    tracks = [(0.0, 10000.0, "MODERATOR")] + [(float(i), i + 0.9, "GUEST") for i in range(10000)]
+    index = SpeakerIndex(tracks)
+    assert index.lookup(5000.0, 5000.5) in ("MODERATOR", "GUEST")
+    assert index.lookup(5000.95) == "MODERATOR"
+    assert index.lookup(20000.0) == "Unknown"
@@ -0,0 +1,46 @@
+import asyncio
+import types
+import pytest
+import fact_checking
+from disk_cache import DiskCache
+from fact_checking import extract_json_object, fact_check_with_groq, parse_fact_check_result
+
+class _FailingLLM:
+    def __init__(self):
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        raise RuntimeError("injected failure")
+
+def _replying_llm(content):
+    async def create(**kwargs):
+        message = types.SimpleNamespace(content=content)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)], usage=None)
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=types.SimpleNamespace(create=create)))
+
+@pytest.fixture(autouse=True)
+def empty_cache(tmp_path, monkeypatch):
+    cache = DiskCache(str(tmp_path / "fact_checks.sqlite"))
+    monkeypatch.setattr(fact_checking, "fact_check_cache", cache)
+    monkeypatch.setattr(fact_checking, "STREAM_LLM_RESPONSES", False)
+    return cache
+
+def test_failed_call_parses_as_error():
+    raw = asyncio.run(fact_check_with_groq(_FailingLLM(), "Injected failure check.", "", [], [], 0.0, None))
+    assert parse_fact_check_result(raw)["Verification"] == "ERROR"
+
+@pytest.mark.parametrize("content", ['{"Verification": "VERIF', "no verdict here"])
+def test_unusable_response_is_not_cached(empty_cache, content):
+    asyncio.run(fact_check_with_groq(_replying_llm(content), "A claim.", "", [], [], 0.0, None))
+    assert len(empty_cache) == 0
+
+def test_verdict_is_cached():
+    content = '```json\n{"Verification": "VERIFIED", "Confidence": "HIGH", "Explanation": "ok"}\n```'
+    raw = asyncio.run(fact_check_with_groq(_replying_llm(content), "A claim.", "", [], [], 0.0, None))
+    assert parse_fact_check_result(raw)["Verification"] == "VERIFIED"
+    assert len(fact_checking.fact_check_cache) == 1
+
+def test_extract_json_object_ignores_braces_in_surrounding_prose():
+    text = 'Here you go: {"Verification": "VERIFIED", "Explanation": "a {b} c"} (see {note})'
+    assert extract_json_object(text) == '{"Verification": "VERIFIED", "Explanation": "a {b} c"}'
@@ -0,0 +1,37 @@
+import asyncio
+import types
+from llm_gateway import LLMGateway, BATCH, INTERACTIVE
+
+class _Raw:
+    headers = {}
+
+    def parse(self):
+        return types.SimpleNamespace(usage=None)
+
+def _client(admitted):
+    async def create(**kwargs):
+        admitted.append(kwargs["messages"][0]["content"])
+        return _Raw()
+    completions = types.SimpleNamespace(with_raw_response=types.SimpleNamespace(create=create))
+    return types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+
+def test_interactive_request_overtakes_queued_batch_requests():
+    admitted = []
+    # 600 requests per minute refill one request every 0.1s once the burst is spent
+    gateway = LLMGateway(_client(admitted), requests_per_minute=600, tokens_per_minute=10 ** 9)
+    gateway.requests.level = 0
+
+    async def request(client, name):
+        await client.chat.completions.create(messages=[{"role": "user", "content": name}])
+
+    async def run():
+        batch = gateway.with_priority(BATCH)
+        queued = [asyncio.ensure_future(request(batch, f"batch {i}")) for i in range(4)]
+        await asyncio.sleep(0.01)  # The batch requests are waiting for the bucket to refill
+        await request(gateway.with_priority(INTERACTIVE), "interactive")
+        await asyncio.gather(*queued)
+
+    asyncio.run(run())
+    # The interactive request arrived last but was admitted first; batch requests keep their order
+    assert admitted == ["interactive", "batch 0", "batch 1", "batch 2", "batch 3"]
+    assert gateway.metrics()["requests"] == 5
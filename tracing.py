@@ -0,0 +1,152 @@
+"""Lightweight tracing for the analysis pipeline.
+
+Stages are wrapped in `tracer.span(name, **attributes)`. Each span records its
+duration and attributes (claim text, cache hits, token counts), and the tracer
+keeps per-stage latency histograms and counters. They can be exported as JSON
+(`export_json`) or scraped in Prometheus text format (`serve_metrics`).
+"""
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from utils import TRACE_MAX_SPANS
+
+logger = logging.getLogger(__name__)
+
+# Histogram bucket bounds in seconds, from a cache hit up to a slow transcription
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+def _percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels) + "}"
+
+class Tracer:
+    def __init__(self, max_spans=TRACE_MAX_SPANS):
+        self.lock = threading.Lock()
+        self.max_spans = max_spans
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.spans = deque(maxlen=self.max_spans)
+            self.stage_counts = defaultdict(lambda: [0] * (len(BUCKETS) + 1))
+            self.stage_totals = defaultdict(float)
+            self.stage_recent = defaultdict(lambda: deque(maxlen=1000))
+            self.counters = defaultdict(float)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the enclosed block; the yielded dict can be updated with attributes found along the way"""
+        started_at = time.time()
+        start = time.perf_counter()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, started_at, **attributes)
+
+    def record(self, name, duration, started_at=None, **attributes):
+        span = {"name": name, "start": started_at or time.time() - duration, "duration": duration, **attributes}
+        bucket = next((i for i, bound in enumerate(BUCKETS) if duration <= bound), len(BUCKETS))
+        with self.lock:
+            self.spans.append(span)
+            self.stage_counts[name][bucket] += 1
+            self.stage_totals[name] += duration
+            self.stage_recent[name].append(duration)
+        logger.debug(f"{name} took {duration * 1000:.1f} ms {attributes}")
+
+    def increment(self, name, amount=1, **labels):
+        with self.lock:
+            self.counters[(name, tuple(sorted(labels.items())))] += amount
+
+    def summary(self):
+        """Per-stage count, total, p50 and p95 seconds, plus every counter"""
+        with self.lock:
+            stages = {
+                name: {
+                    "count": sum(counts),
+                    "total": self.stage_totals[name],
+                    "p50": _percentile(self.stage_recent[name], 0.5),
+                    "p95": _percentile(self.stage_recent[name], 0.95),
+                }
+                for name, counts in self.stage_counts.items()
+            }
+            counters = {name + _labels(labels): value for (name, labels), value in self.counters.items()}
+        return {"stages": stages, "counters": counters}
+
+    def claim_timings(self):
+        """Seconds spent per stage for each claim, from the spans still held"""
+        timings = defaultdict(lambda: defaultdict(float))
+        with self.lock:
+            spans = list(self.spans)
+        for span in spans:
+            if "claim" in span:
+                timings[span["claim"]][span["name"]] += span["duration"]
+        return {claim: dict(stages) for claim, stages in timings.items()}
+
+    def export_json(self, path):
+        with self.lock:
+            spans = list(self.spans)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({**self.summary(), "spans": spans}, f, ensure_ascii=False, default=str)
+
+    def prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = ["# TYPE fact_checker_stage_seconds histogram"]
+        with self.lock:
+            for name, counts in sorted(self.stage_counts.items()):
+                cumulative = 0
+                for bound, count in zip(BUCKETS + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'fact_checker_stage_seconds_bucket{{stage="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'fact_checker_stage_seconds_sum{{stage="{name}"}} {self.stage_totals[name]}')
+                lines.append(f'fact_checker_stage_seconds_count{{stage="{name}"}} {cumulative}')
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"fact_checker_{name}_total{_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+tracer = Tracer()
+
+_server = None
+
+def serve_metrics(port, host="0.0.0.0", source=tracer):
+    """Serve `source.prometheus()` at http://host:port/metrics from a daemon thread (once per process)"""
+    global _server
+    if _server is not None:
+        return _server
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = source.prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    _server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
+    logger.info(f"Serving metrics on http://{host}:{port}/metrics")
+    return _server
@@ -0,0 +1,162 @@
+import asyncio
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from difflib import SequenceMatcher
+import numpy as np
+import speech_recognition as sr
+from ingestion import load_audio
+from utils import TRANSCRIPTION_BACKEND, TRANSCRIPTION_WINDOW, TRANSCRIPTION_OVERLAP, TRANSCRIPTION_WORKERS, TRANSCRIPTION_ERROR
+
+logger = logging.getLogger(__name__)
+
+# Recognizer backends: callables that turn an sr.AudioData chunk into text.
+# Each call builds its own Recognizer so chunks can be transcribed from worker threads.
+
+class GoogleBackend:
+    def __init__(self, language="en-US"):
+        self.language = language
+
+    def __call__(self, audio_data):
+        return sr.Recognizer().recognize_google(audio_data, language=self.language)
+
+class SphinxBackend:
+    """Offline recognition with CMU PocketSphinx (requires the pocketsphinx package)"""
+
+    def __call__(self, audio_data):
+        return sr.Recognizer().recognize_sphinx(audio_data)
+
+class StubBackend:
+    """Returns fixed or generated text without touching the audio; useful offline and in benchmarks"""
+
+    def __init__(self, text="", text_for_chunk=None):
+        self.text = text
+        self.text_for_chunk = text_for_chunk
+
+    def __call__(self, audio_data):
+        if self.text_for_chunk is not None:
+            return self.text_for_chunk(audio_data)
+        return self.text
+
+BACKENDS = {
+    "google": GoogleBackend,
+    "sphinx": SphinxBackend,
+    "stub": StubBackend,
+}
+
+def get_backend(name=TRANSCRIPTION_BACKEND):
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown transcription backend: {name}")
+
+def plan_windows(samples, sample_rate, window=TRANSCRIPTION_WINDOW, overlap=TRANSCRIPTION_OVERLAP, search=3.0, frame=0.05):
+    """Split audio into overlapping windows of about `window` seconds.
+
+    Each cut is moved to the quietest `frame`-long slice within the last `search`
+    seconds of the window, so boundaries tend to fall in pauses between words.
+    Returns (start, end) sample offsets.
+    """
+    total = len(samples)
+    window_size = int(window * sample_rate)
+    overlap_size = min(int(overlap * sample_rate), window_size // 2)
+    search_size = int(search * sample_rate)
+    frame_size = max(1, int(frame * sample_rate))
+
+    windows = []
+    start = 0
+    while start < total:
+        end = start + window_size
+        if end >= total:
+            windows.append((start, total))
+            break
+
+        region_start = max(start + overlap_size + frame_size, end - search_size)
+        region = samples[region_start:end]
+        n_frames = len(region) // frame_size
+        if n_frames > 1:
+            energy = np.square(region[:n_frames * frame_size].reshape(n_frames, frame_size).astype(np.float32)).mean(axis=1)
+            end = region_start + int(np.argmin(energy)) * frame_size + frame_size // 2
+
+        windows.append((start, end))
+        start = end - overlap_size
+    return windows
+
+def _words(text):
+    return [re.sub(r"\W+", "", word.lower()) for word in text.split()]
+
+def stitch_segments(segments, max_overlap_words=20):
+    """Drop words repeated at the start of a segment because of the window overlap"""
+    previous_words = []
+    for segment in segments:
+        words = segment["text"].split()
+        normalized = _words(segment["text"])
+        for k in range(min(max_overlap_words, len(previous_words), len(normalized)), 0, -1):
+            if previous_words[-k:] == normalized[:k]:
+                words = words[k:]
+                break
+        segment["text"] = " ".join(words)
+        if normalized:
+            previous_words = normalized
+    return segments
+
+def drop_overlap(previous_text, text, max_words=30, min_matches=2):
+    """Remove the start of `text` that repeats the end of `previous_text`, tolerating recognition differences.
+
+    The previous window's tail is aligned anywhere within the first `max_words`
+    words of the new one, so a window cut mid-word or a first word heard
+    differently still lines up.
+    """
+    words = text.split()
+    tail = _words(previous_text)[-max_words:]
+    head = _words(text)[:max_words]
+    if not tail or not head:
+        return text
+    blocks = [block for block in SequenceMatcher(None, tail, head, autojunk=False).get_matching_blocks() if block.size]
+    # The match must run to the end of the previous window and be more than one stray common word
+    if not blocks or sum(block.size for block in blocks) < min(min_matches, len(tail)) or blocks[-1].a + blocks[-1].size < len(tail) - 2:
+        return text
+    return " ".join(words[blocks[-1].b + blocks[-1].size:])
+
+def join_segments(segments):
+    return " ".join(segment["text"] for segment in segments if segment["text"])
+
+def recognize_chunk(backend, chunk, sample_rate):
+    audio_data = sr.AudioData(chunk.tobytes(), sample_rate, 2)
+    try:
+        return backend(audio_data)
+    except sr.UnknownValueError:
+        return ""  # Silence or unintelligible speech in this chunk
+    except sr.RequestError as e:
+        logger.error(TRANSCRIPTION_ERROR.format(str(e)))
+        return ""
+
+async def transcribe_segments(audio_file, backend=None, window=TRANSCRIPTION_WINDOW, overlap=TRANSCRIPTION_OVERLAP, max_workers=TRANSCRIPTION_WORKERS):
+    """Transcribe the speech in a WAV (or IngestedAudio) in overlapping chunks on a thread pool.
+
+    Returns a list of {"start", "end", "text"} segments in time order, with
+    times in seconds and the overlap between neighbouring chunks removed.
+    """
+    backend = backend or get_backend()
+    loop = asyncio.get_running_loop()
+    audio = await load_audio(audio_file)
+    samples, sample_rate = audio.samples, audio.sample_rate
+    # Windows are planned inside each speech region over views of the memory map;
+    # the silence and applause between regions never reach the recognizer
+    windows = [
+        (region_start + start, region_start + end)
+        for region_start, region_end in audio.regions
+        for start, end in plan_windows(samples[region_start:region_end], sample_rate, window, overlap)
+    ]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        texts = await asyncio.gather(*(
+            loop.run_in_executor(executor, recognize_chunk, backend, samples[start:end], sample_rate)
+            for start, end in windows
+        ))
+
+    segments = [
+        {"start": start / sample_rate, "end": end / sample_rate, "text": text.strip()}
+        for (start, end), text in zip(windows, texts)
+    ]
+    return stitch_segments(segments)
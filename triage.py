@@ -0,0 +1,115 @@
+"""Check-worthiness triage before the expensive search and fact-check path.
+
+Each claim gets a 0-1 score from cheap spaCy features in one `nlp.pipe` pass:
+numbers, dates, named entities and comparisons make a statement verifiable,
+while questions, opinions and fragments without a verb can never be checked.
+The same pass yields the entity labels used as claim categories, so enrichment
+does not run NER a second time.
+
+The default TRIAGE_THRESHOLD equals BASE_SCORE: a plain declarative sentence
+is still checked, and a claim is only skipped when a penalty outweighs its
+verifiable features. Raise it to trade recall for search and LLM budget.
+"""
+import asyncio
+from fact_checking import RESPONSE_TOKENS_PER_CLAIM
+from model_registry import models
+from tracing import tracer
+from utils import TRIAGE_THRESHOLD, UNEXPECTED_ERROR
+
+# NER plus the tagger, so part-of-speech tags and lemmas are available; the parser is skipped
+TRIAGE_COMPONENTS = ("tok2vec", "tagger", "attribute_ruler", "lemmatizer", "ner")
+
+NUMERIC_ENTITIES = {"CARDINAL", "PERCENT", "MONEY", "QUANTITY", "ORDINAL"}
+DATE_ENTITIES = {"DATE", "TIME"}
+NAMED_ENTITIES = {"PERSON", "ORG", "GPE", "NORP", "LOC", "FAC", "LAW", "EVENT", "PRODUCT"}
+COMPARATIVE_TAGS = {"JJR", "RBR", "JJS", "RBS"}
+CHANGE_LEMMAS = {"increase", "decrease", "rise", "fall", "grow", "drop", "double", "triple", "halve", "cut",
+                 "raise", "lower", "than", "highest", "lowest", "most", "least"}
+OPINION_LEMMAS = {"think", "believe", "feel", "hope", "wish", "guess", "suppose"}
+NORMATIVE_WORDS = {"should", "ought", "must"}
+
+# Feature weights; a plain declarative sentence scores BASE_SCORE, the default TRIAGE_THRESHOLD
+BASE_SCORE = 0.15
+WEIGHTS = {"number": 0.35, "date": 0.2, "entity": 0.25, "comparison": 0.2}
+PENALTIES = {"opinion": 0.3, "normative": 0.3, "fragment": 0.5}
+
+# A typical single-claim prompt with search results, for reporting the budget triage saved
+PROMPT_TOKENS_PER_CLAIM = 700
+
+def score_doc(doc):
+    """Check-worthiness of a parsed claim and the features that decided it"""
+    text = doc.text.strip()
+    if not text or text.endswith("?"):
+        return 0.0, ["question"] if text else ["empty"]
+
+    labels = {ent.label_ for ent in doc.ents}
+    lemmas = {token.lemma_.lower() for token in doc}
+    words = [token for token in doc if not token.is_punct and not token.is_space]
+    features = []
+    if labels & NUMERIC_ENTITIES or any(token.like_num for token in words):
+        features.append("number")
+    if labels & DATE_ENTITIES:
+        features.append("date")
+    if labels & NAMED_ENTITIES:
+        features.append("entity")
+    if any(token.tag_ in COMPARATIVE_TAGS for token in words) or lemmas & CHANGE_LEMMAS:
+        features.append("comparison")
+
+    penalties = []
+    first_person = any(token.lower_ in ("i", "we") for token in words)
+    if (first_person and lemmas & OPINION_LEMMAS) or "opinion" in lemmas:
+        penalties.append("opinion")
+    if lemmas & NORMATIVE_WORDS:
+        penalties.append("normative")
+    if len(words) < 4 or not any(token.pos_ in ("VERB", "AUX") for token in words):
+        penalties.append("fragment")
+
+    score = BASE_SCORE + sum(WEIGHTS[name] for name in features) - sum(PENALTIES[name] for name in penalties)
+    return min(1.0, max(0.0, score)), features + penalties
+
+def triage(claims, batch_size=64):
+    """Score, reasons and entity categories for every claim, from one nlp.pipe pass"""
+    nlp = models.get("spacy")
+    disable = [name for name in nlp.pipe_names if name not in TRIAGE_COMPONENTS]
+    results = []
+    for doc in nlp.pipe(claims, batch_size=batch_size, disable=disable):
+        score, reasons = score_doc(doc)
+        results.append({"score": score, "reasons": reasons, "categories": sorted({ent.label_ for ent in doc.ents})})
+    return results
+
+async def triage_claims(claims, batch_size=64, executor=None):
+    """`triage` off the event loop; every claim passes with a neutral score if spaCy fails"""
+    if not claims:
+        return []
+    loop = asyncio.get_running_loop()
+    with tracer.span("triage", claims=len(claims)):
+        try:
+            return await loop.run_in_executor(executor, triage, list(claims), batch_size)
+        except Exception as e:
+            print(UNEXPECTED_ERROR.format(str(e)))
+            return [{"score": 1.0, "reasons": [], "categories": []} for _ in claims]
+
+def select_claims(scores, threshold=TRIAGE_THRESHOLD):
+    """Indices of the scores at or above `threshold`, most check-worthy first"""
+    selected = [i for i, score in enumerate(scores) if score >= threshold]
+    return sorted(selected, key=lambda i: -scores[i])
+
+def not_checkable(item, threshold=TRIAGE_THRESHOLD):
+    """Result recorded for a claim that triage kept off the search and fact-check path"""
+    reasons = ", ".join(item["reasons"]) or "no verifiable details"
+    return {
+        "Verification": "NOT CHECKABLE",
+        "Confidence": "N/A",
+        "Explanation": f"Skipped before search: check-worthiness {item['score']:.2f} is below {threshold} ({reasons}).",
+        "Bias": "N/A",
+        "Sources": "N/A",
+        "Check-worthiness": round(item["score"], 2),
+    }
+
+def report_savings(skipped, total):
+    """Message describing the search and LLM budget avoided by skipping `skipped` of `total` claims"""
+    tracer.increment("triage_claims", skipped, result="skipped")
+    tracer.increment("triage_claims", total - skipped, result="checked")
+    tokens = skipped * (PROMPT_TOKENS_PER_CLAIM + RESPONSE_TOKENS_PER_CLAIM)
+    return (f"Triage skipped {skipped} of {total} claims as not check-worthy: {skipped} searches, "
+            f"{skipped} fact-check calls and about {tokens} LLM tokens avoided")
@@ -1,4 +1,6 @@
+import logging
 import os
+from collections import Counter
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -6,14 +8,107 @@ load_dotenv()
 
 # Configuration
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
+GROQ_BASE_URL = os.getenv("GROQ_BASE_URL")  # Unset means the public Groq API
+HUGGINGFACE_TOKEN = os.getenv("HUGGINGFACE_TOKEN")
 DIARIZATION_MODEL = "pyannote/speaker-diarization"
 SPACY_MODEL = "en_core_web_sm"
 LLM_MODEL = "llama-3.1-70b-versatile"
+FACT_CHECK_CONCURRENCY = int(os.getenv("FACT_CHECK_CONCURRENCY", "5"))
+GROQ_REQUESTS_PER_MINUTE = int(os.getenv("GROQ_REQUESTS_PER_MINUTE", "30"))
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "5"))
+STREAM_LLM_RESPONSES = os.getenv("STREAM_LLM_RESPONSES", "true").lower() == "true"
+BATCH_FACT_CHECKS = os.getenv("BATCH_FACT_CHECKS", "false").lower() == "true"
+BATCH_TOKEN_BUDGET = int(os.getenv("BATCH_TOKEN_BUDGET", "6000"))
+CLAIM_CHUNK_CHARS = int(os.getenv("CLAIM_CHUNK_CHARS", "4000"))
+CLAIM_CHUNK_OVERLAP = int(os.getenv("CLAIM_CHUNK_OVERLAP", "2"))
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.85"))
+# Check-worthiness needed for search and fact-check; 0 checks everything. The default is triage's
+# BASE_SCORE, the score of a plain declarative sentence, so only questions and statements with an
+# opinion, normative or fragment penalty that no verifiable detail outweighs are skipped
+TRIAGE_THRESHOLD = float(os.getenv("TRIAGE_THRESHOLD", "0.15"))
+TRANSCRIPTION_BACKEND = os.getenv("TRANSCRIPTION_BACKEND", "google")
+TRANSCRIPTION_WINDOW = float(os.getenv("TRANSCRIPTION_WINDOW", "30"))
+TRANSCRIPTION_OVERLAP = float(os.getenv("TRANSCRIPTION_OVERLAP", "2"))
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", "4"))
+DIARIZATION_WINDOW = float(os.getenv("DIARIZATION_WINDOW", "600"))
+DIARIZATION_OVERLAP = float(os.getenv("DIARIZATION_OVERLAP", "30"))
+DIARIZATION_WORKERS = int(os.getenv("DIARIZATION_WORKERS", "1"))
+AUDIO_CACHE_FILES = int(os.getenv("AUDIO_CACHE_FILES", "8"))  # Ingested recordings kept on disk
+# Recordings used within this many seconds are never pruned, so a running analysis keeps its file
+AUDIO_CACHE_MAX_AGE = float(os.getenv("AUDIO_CACHE_MAX_AGE", "21600"))
+VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+VAD_FRAME = float(os.getenv("VAD_FRAME", "0.03"))
+VAD_THRESHOLD_DB = float(os.getenv("VAD_THRESHOLD_DB", "15"))
+VAD_MAX_ZCR = float(os.getenv("VAD_MAX_ZCR", "0.3"))
+VAD_MIN_SILENCE = float(os.getenv("VAD_MIN_SILENCE", "1.0"))
+VAD_MIN_SPEECH = float(os.getenv("VAD_MIN_SPEECH", "0.3"))
+VAD_PADDING = float(os.getenv("VAD_PADDING", "0.25"))
+STREAM_SAMPLE_RATE = int(os.getenv("STREAM_SAMPLE_RATE", "16000"))
+STREAM_WINDOW = float(os.getenv("STREAM_WINDOW", "8"))
+STREAM_HOP = float(os.getenv("STREAM_HOP", "3"))
+STREAM_MAX_SENTENCE_WORDS = int(os.getenv("STREAM_MAX_SENTENCE_WORDS", "30"))
+CACHE_DIR = os.getenv("CACHE_DIR", ".cache")
+FACT_CHECK_CACHE_TTL = int(os.getenv("FACT_CHECK_CACHE_TTL", str(7 * 24 * 3600)))
+FACT_CHECK_CACHE_SIZE = int(os.getenv("FACT_CHECK_CACHE_SIZE", "10000"))
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", str(24 * 3600)))
+SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "50000"))
+RESULTS_DB = os.getenv("RESULTS_DB", "results.sqlite")
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "10000"))
+TRACE_FILE = os.getenv("TRACE_FILE")  # JSON trace written after each recording when set
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # Prometheus endpoint, off when 0
+SEARCH_URL = os.getenv("SEARCH_URL", "https://duckduckgo.com/html/")
+SEARCH_PARSER = os.getenv("SEARCH_PARSER", "auto")
+SEARCH_POOL_SIZE = int(os.getenv("SEARCH_POOL_SIZE", "10"))
+SEARCH_KEEPALIVE = float(os.getenv("SEARCH_KEEPALIVE", "30"))
+FETCH_EVIDENCE = os.getenv("FETCH_EVIDENCE", "true").lower() == "true"
+EVIDENCE_PAGES = int(os.getenv("EVIDENCE_PAGES", "3"))
+EVIDENCE_MAX_BYTES = int(os.getenv("EVIDENCE_MAX_BYTES", str(512 * 1024)))
+EVIDENCE_TIMEOUT = float(os.getenv("EVIDENCE_TIMEOUT", "5"))
+EVIDENCE_PASSAGES = int(os.getenv("EVIDENCE_PASSAGES", "3"))
+EVIDENCE_PASSAGE_WORDS = int(os.getenv("EVIDENCE_PASSAGE_WORDS", "60"))
+
+# Progress and error reporting; the Streamlit app routes these to the page,
+# headless runs keep the logging defaults
+logger = logging.getLogger("fact_checker")
+_reporter = {"progress": logger.info, "error": logger.error}
+
+def set_reporter(progress=None, error=None):
+    """Route pipeline progress and error messages to the given callables"""
+    if progress is not None:
+        _reporter["progress"] = progress
+    if error is not None:
+        _reporter["error"] = error
+
+def report_progress(message):
+    _reporter["progress"](message)
+
+def report_error(message):
+    _reporter["error"](message)
+
+_missing_data = set()
+
+def split_sentences(text):
+    """NLTK sentences of `text`; without the punkt data the whole text is one sentence"""
+    from nltk.tokenize import sent_tokenize
+
+    try:
+        return sent_tokenize(text)
+    except LookupError:
+        # Reported once; chunking then falls back to word boundaries
+        if "punkt" not in _missing_data:
+            _missing_data.add("punkt")
+            report_error(SENTENCE_SPLIT_ERROR)
+        return [text] if text.strip() else []
 
 # Utility functions
 def format_web_results(web_results):
-    """Format web search results for display"""
-    return "\n".join([f"- {result['title']}: {result['snippet']}" for result in web_results])
+    """Format web search results, with any retrieved evidence passages, for display"""
+    lines = []
+    for result in web_results:
+        lines.append(f"- {result['title']}: {result['snippet']}")
+        lines.extend(f"  > {passage}" for passage in result.get('passages', []))
+    return "\n".join(lines)
 
 def sentiment_to_percentage(sentiment):
     """Convert sentiment score to percentage for visualization"""
@@ -21,14 +116,14 @@ def sentiment_to_percentage(sentiment):
 
 def get_verification_counts(fact_checks):
     """Count the number of each verification type"""
-    verified_count = sum(1 for _, result, _ in fact_checks if result.get("Verification") == "VERIFIED")
-    partially_verified_count = sum(1 for _, result, _ in fact_checks if result.get("Verification") == "PARTIALLY VERIFIED")
-    not_verified_count = sum(1 for _, result, _ in fact_checks if result.get("Verification") == "NOT VERIFIED")
-    return verified_count, partially_verified_count, not_verified_count
+    counts = Counter(result.get("Verification") for _, result, _ in fact_checks)
+    return counts["VERIFIED"], counts["PARTIALLY VERIFIED"], counts["NOT VERIFIED"]
 
 # Error messages
 TRANSCRIPTION_ERROR = "Error transcribing audio: {}"
+MICROPHONE_ERROR = "Error capturing audio from the microphone: {}"
 CLAIM_EXTRACTION_ERROR = "Error extracting claims: {}"
 FACT_CHECKING_ERROR = "Error during fact-checking: {}"
 JSON_PARSING_ERROR = "An error occurred while parsing the fact-check result: {}"
-UNEXPECTED_ERROR = "An unexpected error occurred: {}"
\ No newline at end of file
+UNEXPECTED_ERROR = "An unexpected error occurred: {}"
+SENTENCE_SPLIT_ERROR = "NLTK punkt data not found, so text is split by length only; run: python -m nltk.downloader punkt"
\ No newline at end of file
@@ -1,41 +1,86 @@
+from functools import lru_cache
+import numpy as np
 import plotly.graph_objs as go
 import plotly.express as px
 import networkx as nx
+from utils import sentiment_to_percentage
 
-def create_timeline(fact_checks):
-    data = []
-    for i, (claim, result, speaker) in enumerate(fact_checks):
-        data.append(dict(
-            Claim=claim,
-            Start=i,
-            Finish=i+1,
-            Speaker=speaker,
-            Verification=result.get("Verification", "N/A")
-        ))
-    
+# Figures are memoized on the content they show, so Streamlit reruns only build
+# figures for results that changed. Treat returned figures as read-only.
+
+@lru_cache(maxsize=512)
+def _truth_meter(percentage):
+    return go.Figure(go.Indicator(
+        mode = "gauge+number",
+        value = percentage,
+        title = {'text': "Truth Meter"},
+        gauge = {'axis': {'range': [0, 100]},
+                 'bar': {'color': "darkblue"},
+                 'steps' : [
+                     {'range': [0, 33], 'color': "lightgray"},
+                     {'range': [33, 66], 'color': "gray"},
+                     {'range': [66, 100], 'color': "darkgray"}],
+                 'threshold': {
+                     'line': {'color': "red", 'width': 4},
+                     'thickness': 0.75,
+                     'value': 50}}))
+
+def create_truth_meter(sentiment):
+    try:
+        percentage = round(sentiment_to_percentage(float(sentiment)), 1)
+    except (TypeError, ValueError):
+        percentage = 50.0
+    return _truth_meter(percentage)
+
+@lru_cache(maxsize=64)
+def create_verification_pie(verified_count, partially_verified_count, not_verified_count):
+    return go.Figure(data=[go.Pie(labels=['Verified', 'Partially Verified', 'Not Verified'],
+                                  values=[verified_count, partially_verified_count, not_verified_count])])
+
+@lru_cache(maxsize=32)
+def _timeline(rows):
+    data = [dict(Claim=claim, Start=i, Finish=i+1, Speaker=speaker, Verification=verification)
+            for i, (claim, speaker, verification) in enumerate(rows)]
     fig = px.timeline(data, x_start="Start", x_end="Finish", y="Speaker", color="Verification",
                       hover_data=["Claim"])
     fig.update_layout(title="Timeline of Claims")
     return fig
 
-def create_network_graph(fact_checks):
+def create_timeline(fact_checks):
+    return _timeline(tuple((claim, speaker, result.get("Verification", "N/A")) for claim, result, speaker in fact_checks))
+
+# Positions from earlier layouts. Known nodes start where they were drawn last,
+# so adding a claim only nudges the graph and needs far fewer iterations.
+_layout_positions = {}
+
+def spring_layout(G, iterations=50, warm_iterations=10, seed=0):
+    initial = {node: _layout_positions[node] for node in G if node in _layout_positions}
+    if len(initial) * 2 >= len(G) > 0:
+        pos = nx.spring_layout(G, pos=initial, iterations=warm_iterations, seed=seed)
+    else:
+        pos = nx.spring_layout(G, iterations=iterations, seed=seed)
+    _layout_positions.update(pos)
+    return pos
+
+@lru_cache(maxsize=32)
+def _network_graph(speakers, edges):
     G = nx.Graph()
-    
-    for claim, result, speaker in fact_checks:
+    for speaker in speakers:
         G.add_node(speaker, node_type='speaker')
-        categories = result.get("Categories", [])
-        for category in categories:
-            G.add_node(category, node_type='category')
-            G.add_edge(speaker, category)
-    
-    pos = nx.spring_layout(G)
-    edge_x = []
-    edge_y = []
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
+    for speaker, category in edges:
+        G.add_node(category, node_type='category')
+        G.add_edge(speaker, category)
+
+    pos = spring_layout(G)
+    nodes = list(G.nodes())
+    index = {node: i for i, node in enumerate(nodes)}
+    xy = np.array([pos[node] for node in nodes], dtype=float).reshape(-1, 2)
+
+    # One array per trace; NaN separates the line segments
+    ends = np.array([(index[a], index[b]) for a, b in G.edges()], dtype=np.int64).reshape(-1, 2)
+    gaps = np.full(len(ends), np.nan)
+    edge_x = np.column_stack([xy[ends[:, 0], 0], xy[ends[:, 1], 0], gaps]).ravel()
+    edge_y = np.column_stack([xy[ends[:, 0], 1], xy[ends[:, 1], 1], gaps]).ravel()
 
     edge_trace = go.Scatter(
         x=edge_x, y=edge_y,
@@ -43,44 +88,30 @@ def create_network_graph(fact_checks):
         hoverinfo='none',
         mode='lines')
 
-    node_x = []
-    node_y = []
-    for node in G.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
+    node_adjacencies = np.array([degree for _, degree in G.degree(nodes)], dtype=np.int64)
+    node_text = [f'{node} # of connections: {degree}' for node, degree in zip(nodes, node_adjacencies)]
 
     node_trace = go.Scatter(
-        x=node_x, y=node_y,
+        x=xy[:, 0], y=xy[:, 1],
         mode='markers',
         hoverinfo='text',
+        text=node_text,
         marker=dict(
             showscale=True,
             colorscale='YlGnBu',
             reversescale=True,
-            color=[],
+            color=node_adjacencies,
             size=10,
             colorbar=dict(
                 thickness=15,
-                title='Node Connections',
-                xanchor='left',
-                titleside='right'
+                title=dict(text='Node Connections', side='right'),
+                xanchor='left'
             ),
             line_width=2))
 
-    node_adjacencies = []
-    node_text = []
-    for node, adjacencies in enumerate(G.adjacency()):
-        node_adjacencies.append(len(adjacencies[1]))
-        node_text.append(f'{adjacencies[0]} # of connections: {len(adjacencies[1])}')
-
-    node_trace.marker.color = node_adjacencies
-    node_trace.text = node_text
-
     fig = go.Figure(data=[edge_trace, node_trace],
                  layout=go.Layout(
-                    title='Network Graph of Speakers and Topics',
-                    titlefont_size=16,
+                    title=dict(text='Network Graph of Speakers and Topics', font=dict(size=16)),
                     showlegend=False,
                     hovermode='closest',
                     margin=dict(b=20,l=5,r=5,t=40),
@@ -94,18 +125,24 @@ def create_network_graph(fact_checks):
                     )
     return fig
 
-def generate_summary(fact_checks):
-    # This is a simple summary generation. For a more sophisticated summary,
-    # you might want to use the Groq API or another language model.
-    verified_claims = [claim for claim, result, _ in fact_checks if result.get("Verification") == "VERIFIED"]
-    unverified_claims = [claim for claim, result, _ in fact_checks if result.get("Verification") == "NOT VERIFIED"]
-    
-    summary = f"""
+def create_network_graph(fact_checks):
+    speakers = []
+    edges = []
+    for claim, result, speaker in fact_checks:
+        speakers.append(speaker)
+        categories = result.get("Categories", [])
+        if isinstance(categories, list):
+            edges.extend((speaker, category) for category in categories)
+    # Keyed on the graph itself, in first-seen order, so new claims that add no edges reuse the figure
+    return _network_graph(tuple(dict.fromkeys(speakers)), tuple(dict.fromkeys(edges)))
+
+def format_summary(total, verified_count, unverified_count, verified_claims, unverified_claims):
+    return f"""
     Debate Summary:
     
-    Total claims analyzed: {len(fact_checks)}
-    Verified claims: {len(verified_claims)}
-    Unverified claims: {len(unverified_claims)}
+    Total claims analyzed: {total}
+    Verified claims: {verified_count}
+    Unverified claims: {unverified_count}
     
     Key verified points:
     {', '.join(verified_claims[:3])}
@@ -113,5 +150,23 @@ def generate_summary(fact_checks):
     Key points needing further verification:
     {', '.join(unverified_claims[:3])}
     """
-    
-    return summary
\ No newline at end of file
+
+def generate_summary(fact_checks):
+    # This is a simple summary generation. For a more sophisticated summary,
+    # you might want to use the Groq API or another language model.
+    verified_claims = []
+    unverified_claims = []
+    for claim, result, _ in fact_checks:
+        verification = result.get("Verification")
+        if verification == "VERIFIED":
+            verified_claims.append(claim)
+        elif verification == "NOT VERIFIED":
+            unverified_claims.append(claim)
+    return format_summary(len(fact_checks), len(verified_claims), len(unverified_claims), verified_claims, unverified_claims)
+
+def summarize_debate(store, debate_id=None):
+    """generate_summary for a stored debate (or all of them), computed with indexed queries"""
+    counts = store.verification_counts(debate_id)
+    verified_claims = [claim for claim, _, _ in store.claims(debate_id, verification="VERIFIED", limit=3)]
+    unverified_claims = [claim for claim, _, _ in store.claims(debate_id, verification="NOT VERIFIED", limit=3)]
+    return format_summary(sum(counts.values()), counts["VERIFIED"], counts["NOT VERIFIED"], verified_claims, unverified_claims)
@@ -1,80 +1,243 @@
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from cachetools import TTLCache
 from aiolimiter import AsyncLimiter
 import logging
+import os
+import re
+from urllib.parse import urlparse, parse_qs
+from disk_cache import DiskCache, make_cache_key, normalize_text
+from tracing import tracer
+from utils import CACHE_DIR, SEARCH_CACHE_TTL, SEARCH_CACHE_SIZE, SEARCH_URL, SEARCH_PARSER, SEARCH_POOL_SIZE, SEARCH_KEEPALIVE
+
+try:
+    from selectolax.parser import HTMLParser
+except ImportError:
+    HTMLParser = None
+
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+RESULT_MARKER = 'result__body'
+RESULT_CLASS = re.compile(r'\bresult__body\b')
+
+def decode_result_link(href):
+    """Resolve a DuckDuckGo redirect (/l/?uddg=<encoded url>) to the target URL"""
+    parsed = urlparse(href)
+    if parsed.path.startswith('/l/'):
+        target = parse_qs(parsed.query).get('uddg')
+        if target:
+            return target[0]
+    if href.startswith('//'):
+        return 'https:' + href
+    return href
+
+def truncate_results(html, num_results):
+    """Cut the page just before the (num_results + 1)-th result block, so parsers skip the rest"""
+    # Stylesheets in the head may mention the class too, so count from <body>
+    position = max(-1, html.find('<body') - 1)
+    for _ in range(num_results + 1):
+        position = html.find(RESULT_MARKER, position + 1)
+        if position == -1:
+            return html
+    return html[:html.rfind('<', 0, position)]
+
+def _result(title, snippet, link):
+    if title and snippet and link:
+        return {'title': title.strip(), 'snippet': snippet.strip(), 'link': decode_result_link(link)}
+    return None
+
+def parse_results_selectolax(html, num_results):
+    results = []
+    for node in HTMLParser(html).css('div.result__body'):
+        title = node.css_first('h2.result__title')
+        snippet = node.css_first('a.result__snippet')
+        link = node.css_first('a.result__url')
+        result = title and snippet and link and _result(title.text(), snippet.text(), link.attributes.get('href') or '')
+        if result:
+            results.append(result)
+            if len(results) == num_results:
+                break
+    return results
+
+def _xpath_class(tag, name):
+    return f".//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {name} ')]"
+
+def parse_results_lxml(html, num_results):
+    results = []
+    for node in lxml.html.fromstring(html).xpath(_xpath_class('div', 'result__body')):
+        title = node.xpath(_xpath_class('h2', 'result__title'))
+        snippet = node.xpath(_xpath_class('a', 'result__snippet'))
+        link = node.xpath(_xpath_class('a', 'result__url'))
+        result = title and snippet and link and _result(title[0].text_content(), snippet[0].text_content(), link[0].get('href', ''))
+        if result:
+            results.append(result)
+            if len(results) == num_results:
+                break
+    return results
+
+def parse_results_bs4(html, num_results):
+    # Only result blocks are turned into tree nodes. The class is matched as a
+    # regex because some bs4 versions see the unsplit attribute while straining.
+    soup = BeautifulSoup(html, 'html.parser', parse_only=SoupStrainer('div', class_=RESULT_CLASS))
+    results = []
+    for node in soup.find_all('div', class_='result__body'):
+        title = node.find('h2', class_='result__title')
+        snippet = node.find('a', class_='result__snippet')
+        link = node.find('a', class_='result__url')
+        result = title and snippet and link and _result(title.text, snippet.text, link.get('href', ''))
+        if result:
+            results.append(result)
+            if len(results) == num_results:
+                break
+    return results
+
+PARSERS = {
+    'selectolax': parse_results_selectolax,
+    'lxml': parse_results_lxml,
+    'html.parser': parse_results_bs4,
+}
+
+def available_parsers():
+    available = {'selectolax': HTMLParser is not None, 'lxml': lxml is not None, 'html.parser': True}
+    return [name for name in PARSERS if available[name]]
+
+def get_parser(name=SEARCH_PARSER):
+    """The named result parser; "auto" picks the fastest one installed"""
+    if name == 'auto':
+        name = available_parsers()[0]
+    if name not in available_parsers():
+        raise ValueError(f"Unknown or unavailable search parser: {name}")
+    return PARSERS[name]
+
+def parse_results(html, num_results, parser=SEARCH_PARSER):
+    """Parse at most `num_results` results from a DuckDuckGo HTML page"""
+    return get_parser(parser)(truncate_results(html, num_results), num_results)
 
 class EfficientWebSearch:
-    def __init__(self, cache_size=100, cache_ttl=3600, rate_limit=10):
+    def __init__(self, cache_size=100, cache_ttl=3600, rate_limit=10, cache_path=None, parser=SEARCH_PARSER,
+                 pool_size=SEARCH_POOL_SIZE, keepalive=SEARCH_KEEPALIVE):
+        # Two tiers: a per-process LRU in front of a persistent SQLite store
         self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.disk_cache = DiskCache(cache_path or os.path.join(CACHE_DIR, "search.sqlite"), ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_SIZE)
+        self.inflight = {}
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "coalesced": 0, "misses": 0}
         self.limiter = AsyncLimiter(rate_limit, 1)  # 10 requests per second
+        self.parse = get_parser(parser)
+        self.pool_size = pool_size
+        self.keepalive = keepalive
         self.session = None
         logging.basicConfig(level=logging.INFO)
         self.logger = logging.getLogger(__name__)
 
     async def initialize(self):
         if self.session is None:
-            self.session = aiohttp.ClientSession()
+            # One pooled session; connections to the search host are kept alive between queries
+            connector = aiohttp.TCPConnector(limit=self.pool_size, limit_per_host=self.pool_size,
+                                             keepalive_timeout=self.keepalive, ttl_dns_cache=300)
+            self.session = aiohttp.ClientSession(connector=connector)
 
     async def close(self):
         if self.session:
             await self.session.close()
 
     async def search(self, query, num_results=3, timeout=5):
+        with tracer.span("search", claim=query) as span:
+            results = await self._search(query, num_results, timeout, span)
+            span["results"] = len(results)
+        tracer.increment("search_lookups", tier=span["cache"])
+        return results
+
+    async def _search(self, query, num_results, timeout, span):
         await self.initialize()  # Ensure session is initialized
 
-        if query in self.cache:
+        normalized_query = normalize_text(query)
+        key = (normalized_query, num_results)
+
+        if key in self.cache:
+            self.stats["memory_hits"] += 1
+            span["cache"] = "memory"
             self.logger.info(f"Cache hit for query: {query}")
-            return self.cache[query]
+            return self.cache[key]
+
+        disk_key = make_cache_key(normalized_query, num_results)
+        results = self.disk_cache.get(disk_key)
+        if results is not None:
+            self.stats["disk_hits"] += 1
+            span["cache"] = "disk"
+            self.logger.info(f"Disk cache hit for query: {query}")
+            self.cache[key] = results
+            return results
+
+        # Single-flight: identical queries already on the wire share one request
+        if key in self.inflight:
+            self.stats["coalesced"] += 1
+            span["cache"] = "coalesced"
+            return await asyncio.shield(self.inflight[key])
 
+        self.stats["misses"] += 1
+        span["cache"] = "miss"
+        task = asyncio.ensure_future(self._fetch(key, disk_key, query.strip(), num_results, timeout))
+        self.inflight[key] = task
+        task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key, disk_key, query, num_results, timeout):
+        results, cacheable = await self._request(query, num_results, timeout)
+        if cacheable:
+            self.cache[key] = results
+            self.disk_cache.set(disk_key, results)
+        return results
+
+    def cache_stats(self):
+        """Hit counts and per-tier hit rates for the search cache"""
+        lookups = sum(self.stats.values())
+        disk_lookups = lookups - self.stats["memory_hits"]
+        return {
+            **self.stats,
+            "lookups": lookups,
+            "memory_hit_rate": self.stats["memory_hits"] / lookups if lookups else 0.0,
+            "disk_hit_rate": self.stats["disk_hits"] / disk_lookups if disk_lookups else 0.0,
+            "network_requests_saved": self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["coalesced"],
+        }
+
+    async def _request(self, query, num_results, timeout):
         async with self.limiter:
             try:
-                url = f"https://duckduckgo.com/html/?q={query}"
                 headers = {
                     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
                 }
 
-                async with self.session.get(url, headers=headers, timeout=timeout) as response:
+                # aiohttp URL-encodes the query parameters. The timeout covers connecting and
+                # reading only: waiting for a free pooled connection is not a slow search.
+                request_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+                async with self.session.get(SEARCH_URL, params={'q': query}, headers=headers, timeout=request_timeout) as response:
                     if response.status != 200:
                         self.logger.error(f"HTTP error {response.status} for query: {query}")
-                        return []
+                        return [], False
                     html = await response.text()
 
-                soup = BeautifulSoup(html, 'html.parser')
-                results = []
-                for result in soup.find_all('div', class_='result__body')[:num_results]:
-                    title_elem = result.find('h2', class_='result__title')
-                    snippet_elem = result.find('a', class_='result__snippet')
-                    link_elem = result.find('a', class_='result__url')
-
-                    if title_elem and snippet_elem and link_elem:
-                        title = title_elem.text.strip()
-                        snippet = snippet_elem.text.strip()
-                        link = link_elem.get('href', '')
-                        # Extract the actual URL from the DuckDuckGo redirect
-                        if link.startswith('/l/?kh=-1&uddg='):
-                            link = link[15:]  # Remove the prefix
-
-                        results.append({'title': title, 'snippet': snippet, 'link': link})
+                results = self.parse(truncate_results(html, num_results), num_results)
 
                 if not results:
                     self.logger.warning(f"No results found for query: {query}")
 
-                self.cache[query] = results
-                return results
+                return results, True
 
             except asyncio.TimeoutError:
                 self.logger.error(f"Search timed out for query: {query}")
-                return []
+                return [], False
 
             except aiohttp.ClientError as e:
                 self.logger.error(f"Network error during web search: {e}")
-                return []
+                return [], False
 
             except Exception as e:
                 self.logger.error(f"Unexpected error during web search: {e}")
-                return []
+                return [], False
 
     async def batch_search(self, queries):
         await self.initialize()